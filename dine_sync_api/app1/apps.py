@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class App1Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app1'
+
+    def ready(self):
+        if getattr(settings, 'WARM_UP_ON_READY', False):
+            # imports only: no queries here, see app1/warmup.py
+            from .warmup import warm_urls_and_serializers
+            warm_urls_and_serializers()
@@ -0,0 +1,7 @@
+"""
+Benchmark helpers for the sync and read endpoints.
+
+Run through the management commands: python manage.py bench --help
+(single requests, per endpoint) and python manage.py load_test --help
+(many concurrent terminals and dashboards, for capacity).
+"""
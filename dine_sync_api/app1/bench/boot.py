@@ -0,0 +1,76 @@
+"""
+Worker boot-to-first-response timing.
+
+Run as a fresh process (`python -m app1.bench.boot URL`) from the project
+directory, it loads the WSGI application the way a gunicorn sync worker
+does, post_worker_init warm-up included, answers one GET for URL through
+it and prints a JSON line of timings:
+
+    boot_ms            WSGI application import, django.setup() and warm-up
+    first_response_ms  the first request, until its body is complete
+    second_response_ms the same request again, for comparison
+    answered_at        wall clock (time.time()) when the first response was
+                       complete, so the parent can time the whole process
+"""
+import io
+import json
+import sys
+import time
+
+
+def wsgi_get(application, url):
+    path, _, query = url.partition('?')
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in body:
+            pass
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return int(statuses[0].split()[0])
+
+
+def main(url):
+    started = time.perf_counter()
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    from django.conf import settings
+
+    if getattr(settings, 'WARM_UP_ON_READY', False):
+        from app1.warmup import warm_worker
+
+        warm_worker()
+    booted = time.perf_counter()
+    status = wsgi_get(application, url)
+    answered = time.perf_counter()
+    answered_at = time.time()
+    wsgi_get(application, url)
+    print(json.dumps({
+        'status': status,
+        'boot_ms': round((booted - started) * 1000, 1),
+        'first_response_ms': round((answered - booted) * 1000, 1),
+        'second_response_ms': round((time.perf_counter() - answered) * 1000, 1),
+        'answered_at': answered_at,
+    }))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1])
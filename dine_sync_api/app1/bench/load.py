@@ -0,0 +1,438 @@
+"""
+Load generator for capacity runs: how many outlets one deployment serves
+before sync latency degrades.
+
+Simulated clients drive the real URL routes of app1/urls.py:
+
+    terminals   one POS per outlet, syncing every `sync_interval` seconds.
+                The first cycle and a `full_ratio` share of the rest are
+                full syncs (every table); the others are delta syncs that
+                ring up `bills_per_sync` new bills and post the tables that
+                change during service (bills, KOT lines, cancellations).
+                Like the real POS, every sync POSTs the whole table.
+    dashboards  reporting screens polling GETs every `poll_interval`
+                seconds, picking endpoints by the weights of `read_mix`.
+
+Requests go through the Django test client in this process (against the
+bench database) or over HTTP to a running server. The report has
+throughput, latency percentiles and error/429 counts per endpoint, the
+latency of whole sync cycles, and the database connections in use.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from datetime import date, timedelta
+from urllib.parse import urlsplit
+
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import reverse
+
+from app1.bench.runner import percentile
+from app1.bench.synthetic import CANCELLED_RATIO, generate_bills, generate_dataset, generate_kot_lines
+
+# Tables in the order a terminal posts them
+FULL_SYNC = ['acc_users_api', 'items_api', 'bills_month_api', 'bills_api', 'kot_sales_api', 'cancelled_bills_api']
+DELTA_SYNC = ['bills_api', 'kot_sales_api', 'cancelled_bills_api']
+
+DEFAULT_READ_MIX = {
+    'bills_api': 3,
+    'bill_batch_api': 2,
+    'kitchen_load_api': 2,
+    'price_list_api': 2,
+    'bills_month_api': 1,
+    'cancelled_bills_api': 1,
+}
+
+
+# ---------------------------------------------------------------------------
+# Transports
+# ---------------------------------------------------------------------------
+
+class InProcessTransport:
+    """Requests through the Django test client, one client (and DB connection) per thread."""
+    name = 'in-process'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = Client()
+        if method == 'POST':
+            response = client.post(path, data=body, content_type='application/json', headers=headers)
+        else:
+            response = client.get(path, headers=headers)
+        return response.status_code
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpTransport:
+    """Requests to a running server, one keep-alive connection per thread."""
+    name = 'http'
+
+    def __init__(self, target):
+        parts = urlsplit(target)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f'target must be an http(s) URL, got {target!r}')
+        self.connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.local = threading.local()
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            conn = getattr(self.local, 'conn', None)
+            reused = conn is not None
+            if conn is None:
+                conn = self.local.conn = self.connection_class(self.netloc, timeout=300)
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.will_close:
+                    self.close()
+                return response.status
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if not reused or attempt == 2:  # only a stale keep-alive connection is retried
+                    raise
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+# ---------------------------------------------------------------------------
+# Simulated clients
+# ---------------------------------------------------------------------------
+
+class Terminal:
+    """One outlet's POS: its synthetic tables and the bills it rings up between syncs."""
+
+    def __init__(self, outlet, kot_rows, seed, bills_per_sync):
+        self.outlet = outlet
+        self.rng = random.Random(seed)
+        self.tables = generate_dataset(kot_rows=kot_rows, seed=seed)
+        self.bills_per_sync = bills_per_sync
+        self.bodies = {}  # url name -> JSON body, dropped when the table changes
+        self.syncs = 0
+
+    @property
+    def last_day(self):
+        return date.fromisoformat(self.tables['bills_month_api'][-1]['date'])
+
+    def ring_up(self):
+        """New bills (and their KOT lines) since the last sync; now and then one is cancelled."""
+        month_bills = self.tables['bills_month_api']
+        kot_lines = self.tables['kot_sales_api']
+        bills = generate_bills(
+            self.rng, self.bills_per_sync, self.last_day, days=1, first_billno=month_bills[-1]['billno'] + 1
+        )
+        lines = generate_kot_lines(
+            self.rng, bills, self.tables['items_api'], first_slno=(kot_lines[-1]['slno'] + 1) if kot_lines else 1
+        )
+        month_bills.extend(bills)
+        self.tables['bills_api'].extend(bills)
+        kot_lines.extend(lines)
+        changed = {'bills_month_api', 'bills_api', 'kot_sales_api'}
+        if self.rng.random() < CANCELLED_RATIO * len(bills):
+            bill = self.rng.choice(bills)
+            self.tables['cancelled_bills_api'].append(
+                {'billno': bill['billno'], 'date': bill['date'], 'creditcard': '', 'colnstatus': 'N'}
+            )
+            changed.add('cancelled_bills_api')
+        for name in changed:
+            self.bodies.pop(name, None)
+
+    def next_sync(self, full_ratio):
+        """('full' or 'delta', the url names to post) for the next cycle"""
+        full = self.syncs == 0 or self.rng.random() < full_ratio
+        if self.syncs:
+            self.ring_up()
+        self.syncs += 1
+        return ('full', FULL_SYNC) if full else ('delta', DELTA_SYNC)
+
+    def body(self, name):
+        if name not in self.bodies:
+            self.bodies[name] = json.dumps(self.tables[name])
+        return self.bodies[name]
+
+
+def read_path(name, terminal, rng):
+    """A dashboard GET of endpoint `name` for the terminal's outlet"""
+    last_day = terminal.last_day
+    if name == 'bills_api':
+        return reverse(name) + '?exclude_cancelled=1'
+    if name == 'bills_month_api':
+        return reverse(name) + f'?from_date={last_day - timedelta(days=6)}&exclude_cancelled=1'
+    if name == 'bill_batch_api':
+        recent = terminal.tables['bills_api'][-50:] or terminal.tables['bills_month_api'][-50:]
+        billnos = [bill['billno'] for bill in rng.sample(recent, min(len(recent), 20))]
+        return reverse(name) + '?billnos=' + ','.join(map(str, billnos))
+    if name == 'kitchen_load_api':
+        return reverse(name) + f'?from_time={last_day}T00:00:00&to_time={last_day}T23:59:59'
+    if name == 'price_list_api':
+        return reverse(name) + f'?tier={rng.randrange(8)}'
+    return reverse(name)
+
+
+READ_ENDPOINTS = list(DEFAULT_READ_MIX) + ['acc_users_api', 'items_api', 'kot_sales_api']
+
+
+def parse_read_mix(value):
+    """'bills_api=3,price_list_api=1' -> {'bills_api': 3, 'price_list_api': 1}"""
+    mix = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in READ_ENDPOINTS:
+            raise ValueError(f"Unknown read endpoint {name}, expected one of: {', '.join(READ_ENDPOINTS)}")
+        try:
+            mix[name] = float(weight) if weight else 1.0
+        except ValueError:
+            raise ValueError(f'Weight of {name} must be a number')
+    if not mix or not any(mix.values()):
+        raise ValueError('read mix needs at least one endpoint with a positive weight')
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+class Recorder:
+    """Collects (scenario, status, seconds) samples from every client thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.failures = {}  # scenario -> first exception message
+
+    def add(self, scenario, status, seconds):
+        with self.lock:
+            self.samples.setdefault(scenario, []).append((status, seconds))
+
+    def timed(self, scenario, fn):
+        """Run fn() -> status code, recording it; exceptions count as errors (status None)"""
+        started = time.perf_counter()
+        try:
+            status = fn()
+        except Exception as e:
+            status = None
+            with self.lock:
+                self.failures.setdefault(scenario, f'{type(e).__name__}: {e}')
+        self.add(scenario, status, time.perf_counter() - started)
+        return status
+
+
+class ConnectionSampler(threading.Thread):
+    """
+    Samples the database connections in use once per `interval`.
+
+    On Postgres it counts the other backends on the database
+    (pg_stat_activity), which also covers a separate server process;
+    otherwise it counts the open connections of this process's threads,
+    which only means something for in-process runs (`in_process`).
+    """
+
+    def __init__(self, in_process, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stop = threading.Event()
+        self.samples = []
+        self.opened = 0
+        self.wrappers = set()
+        self.lock = threading.Lock()
+        if connection.vendor == 'postgresql':
+            self.source = 'pg_stat_activity'
+        else:
+            self.source = 'django' if in_process else None
+        connection_created.connect(self._created)
+
+    def _created(self, sender, connection, **kwargs):
+        with self.lock:
+            self.opened += 1
+            self.wrappers.add(connection)
+
+    def count(self):
+        if self.source == 'pg_stat_activity':
+            with connections['default'].cursor() as cursor:
+                cursor.execute(
+                    'SELECT count(*) FROM pg_stat_activity WHERE datname = current_database() '
+                    'AND pid <> pg_backend_pid()'
+                )
+                return cursor.fetchone()[0]
+        with self.lock:
+            return sum(1 for wrapper in self.wrappers if wrapper.connection is not None)
+
+    def run(self):
+        if self.source is None:
+            return
+        try:
+            while not self.stop.wait(self.interval):
+                self.samples.append(self.count())
+        finally:
+            connections.close_all()
+
+    def finish(self):
+        self.stop.set()
+        self.join()
+        connection_created.disconnect(self._created)
+        opened = self.opened - (1 if self.source == 'pg_stat_activity' else 0)  # the sampler's own
+        return {
+            'source': self.source,
+            'peak': max(self.samples) if self.samples else None,
+            'mean': round(sum(self.samples) / len(self.samples), 1) if self.samples else None,
+            'opened': opened if self.source == 'django' else None,
+        }
+
+
+def summarize(samples, elapsed):
+    latencies = [seconds for _, seconds in samples]
+    statuses = {}
+    for status, _ in samples:
+        statuses[status] = statuses.get(status, 0) + 1
+    throttled = statuses.get(429, 0)
+    errors = sum(n for status, n in statuses.items() if status is None or (status >= 400 and status != 429))
+
+    def ms(pct):
+        return round(percentile(latencies, pct) * 1000, 1)
+
+    return {
+        'requests': len(samples),
+        'per_sec': round(len(samples) / elapsed, 2),
+        'p50_ms': ms(50),
+        'p95_ms': ms(95),
+        'p99_ms': ms(99),
+        'max_ms': round(max(latencies) * 1000, 1),
+        'errors': errors,
+        'throttled': throttled,
+        'error_rate': round(errors / len(samples), 4),
+        'status_codes': {str(status): n for status, n in sorted(statuses.items(), key=lambda kv: (kv[0] is None, kv[0]))},
+    }
+
+
+# ---------------------------------------------------------------------------
+# The run
+# ---------------------------------------------------------------------------
+
+def run_load(transport, terminals=10, dashboards=20, duration=60.0, sync_interval=30.0, poll_interval=5.0,
+             full_ratio=0.1, read_mix=None, kot_rows=2000, bills_per_sync=5, outlet_prefix='load', seed=2024,
+             log=None):
+    """
+    Run the simulated terminals and dashboards for `duration` seconds.
+
+    Clients start at random offsets within their interval so the run does
+    not open with every terminal syncing at once. Returns the report dict.
+    """
+    read_mix = read_mix or DEFAULT_READ_MIX
+    names, weights = list(read_mix), list(read_mix.values())
+    if log:
+        log(f'Generating data for {terminals} outlets ({kot_rows} KOT lines each)...')
+    fleet = [
+        Terminal(f'{outlet_prefix}{n:04d}', kot_rows, seed + n, bills_per_sync) for n in range(terminals)
+    ]
+    recorder = Recorder()
+    overruns = []  # outlets whose sync cycle outlasted the interval, once per late cycle
+    stop = threading.Event()
+
+    def terminal_loop(terminal):
+        rng = random.Random(terminal.outlet)
+        headers = {'X-Outlet': terminal.outlet}
+        try:
+            if stop.wait(rng.uniform(0, sync_interval)):
+                return
+            next_at = time.monotonic()
+            while not stop.is_set():
+                kind, tables = terminal.next_sync(full_ratio)
+                started = time.perf_counter()
+                statuses = []
+                for name in tables:
+                    body = terminal.body(name)
+                    statuses.append(recorder.timed(
+                        f'POST {name}',
+                        lambda: transport.request('POST', reverse(name), body, headers)
+                    ))
+                # a cycle is as good as its worst request
+                recorder.add(
+                    f'SYNC {kind} cycle', None if None in statuses else max(statuses), time.perf_counter() - started
+                )
+                next_at += sync_interval
+                now = time.monotonic()
+                if now > next_at:  # the cycle took longer than the interval
+                    overruns.append(terminal.outlet)
+                    next_at = now
+                stop.wait(next_at - now)
+        finally:
+            transport.close()
+
+    def dashboard_loop(n):
+        rng = random.Random(seed * 1000 + n)
+        terminal = fleet[n % len(fleet)] if fleet else None
+        headers = {'X-Outlet': terminal.outlet} if terminal else {}
+        try:
+            if stop.wait(rng.uniform(0, poll_interval)):
+                return
+            next_at = time.monotonic()
+            while not stop.is_set():
+                name = rng.choices(names, weights)[0]
+                path = read_path(name, terminal, rng)
+                recorder.timed(f'GET {name}', lambda: transport.request('GET', path, None, headers))
+                next_at += poll_interval
+                stop.wait(max(next_at - time.monotonic(), 0))
+        finally:
+            transport.close()
+
+    threads = [threading.Thread(target=terminal_loop, args=(t,), daemon=True) for t in fleet]
+    threads += [threading.Thread(target=dashboard_loop, args=(n,), daemon=True) for n in range(dashboards)]
+    sampler = ConnectionSampler(in_process=isinstance(transport, InProcessTransport))
+    if log:
+        log(f'Running {terminals} terminals and {dashboards} dashboards against {transport.name} for {duration:.0f}s...')
+    started = time.monotonic()
+    sampler.start()
+    for thread in threads:
+        thread.start()
+    stop.wait(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()  # requests in flight finish and are counted
+    elapsed = time.monotonic() - started
+    db_connections = sampler.finish()
+
+    scenarios = {name: summarize(samples, elapsed) for name, samples in sorted(recorder.samples.items())}
+    requests = [s for name, samples in recorder.samples.items() if not name.startswith('SYNC') for s in samples]
+    return {
+        'meta': {
+            'transport': transport.name,
+            'vendor': connection.vendor,
+            'terminals': terminals,
+            'dashboards': dashboards,
+            'duration_s': duration,
+            'elapsed_s': round(elapsed, 1),
+            'sync_interval_s': sync_interval,
+            'poll_interval_s': poll_interval,
+            'full_ratio': full_ratio,
+            'bills_per_sync': bills_per_sync,
+            'kot_rows': kot_rows,
+            'read_mix': read_mix,
+        },
+        'scenarios': scenarios,
+        'totals': summarize(requests, elapsed) if requests else None,
+        'sync_overruns': len(overruns),
+        'db_connections': db_connections,
+        'failures': recorder.failures,
+    }
@@ -0,0 +1,50 @@
+"""
+Read-path rendering: the serializer + DRF JSONRenderer path the GET
+endpoints used to take, against serialize_rows() + FastJSONRenderer.
+
+Both paths run over the same loaded table, and the rendered bodies are
+compared so a speedup never hides a change in the output.
+"""
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from app1.renderers import FastJSONRenderer
+from app1.serializers import serialize_rows
+
+from .runner import percentile
+
+
+def serializer_path(queryset, serializer_class):
+    data = serializer_class(queryset, many=True).data
+    return JSONRenderer().render({'status': 'success', 'count': len(data), 'data': data})
+
+
+def bypass_path(queryset, serializer_class):
+    data = serialize_rows(queryset, serializer_class)
+    return FastJSONRenderer().render({'status': 'success', 'count': len(data), 'data': data})
+
+
+def _time(fn, runs):
+    samples = []
+    body = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = fn()
+        samples.append(time.perf_counter() - started)
+    return percentile(samples, 50), body
+
+
+def compare_render_paths(queryset, serializer_class, runs=3):
+    """p50 time of each path over `queryset`, the speedup and whether the bodies are identical"""
+    rows = queryset.count()
+    old_p50, old_body = _time(lambda: serializer_path(queryset.all(), serializer_class), runs)
+    new_p50, new_body = _time(lambda: bypass_path(queryset.all(), serializer_class), runs)
+    return {
+        'rows': rows,
+        'serializer_ms': round(old_p50 * 1000, 1),
+        'bypass_ms': round(new_p50 * 1000, 1),
+        'speedup': round(old_p50 / new_p50, 2) if new_p50 else None,
+        'bytes': len(new_body),
+        'identical': old_body == new_body,
+    }
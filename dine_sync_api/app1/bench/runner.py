@@ -0,0 +1,183 @@
+"""
+Scripted POST/GET runs through the Django test client.
+
+Each scenario is one endpoint and one kind of request:
+
+    POST    the full synthetic payload into an empty table, `repeat` times
+    RESYNC  the same payload again over the loaded table (nothing to write)
+    REPLAY  the same payload, answered from the stored result (idempotency)
+    GET     the loaded table, `reads` times
+"""
+import json
+import math
+import platform
+import time
+
+import django
+from django.db import connection
+from django.test import Client
+from django.urls import resolve, reverse
+
+from app1.models import SyncState
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Metrics where a bigger number is an improvement; everything else is a cost.
+HIGHER_IS_BETTER = {'rows_per_sec'}
+COMPARED_METRICS = ['rows_per_sec', 'p50_ms', 'p99_ms', 'peak_rss_mb']
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def reset_peak_rss():
+    """Reset the kernel's high-water mark so each scenario gets its own peak (Linux only)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fh:
+            fh.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as fh:
+            for line in fh:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024.0, 1)
+    except OSError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS, kilobytes everywhere else
+        divisor = 1024.0 * 1024.0 if platform.system() == 'Darwin' else 1024.0
+        return round(peak / divisor, 1)
+    return None
+
+
+def _timed(fn, runs, before=None):
+    reset_peak_rss()
+    samples = []
+    statuses = set()
+    for _ in range(runs):
+        if before:
+            before()
+        started = time.perf_counter()
+        response = fn()
+        samples.append(time.perf_counter() - started)
+        statuses.add(response.status_code)
+    return samples, sorted(statuses), peak_rss_mb()
+
+
+def _summary(rows, samples, statuses, peak):
+    p50 = percentile(samples, 50)
+    return {
+        'rows': rows,
+        'runs': len(samples),
+        'rows_per_sec': round(rows / p50, 1) if p50 else None,
+        'p50_ms': round(p50 * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+        'peak_rss_mb': peak,
+        'status_codes': statuses,
+    }
+
+
+def forget_syncs():
+    """Drop the sync bookkeeping so the next identical POST is not replayed."""
+    SyncState.objects.all().delete()
+
+
+def run_sync(client, url, payload, repeat=3, before=None):
+    body = json.dumps(payload)
+    samples, statuses, peak = _timed(
+        lambda: client.post(url, data=body, content_type='application/json'), repeat, before
+    )
+    return _summary(len(payload), samples, statuses, peak)
+
+
+def run_read(client, url, rows, reads=20):
+    samples, statuses, peak = _timed(lambda: client.get(url), reads)
+    return _summary(rows, samples, statuses, peak)
+
+
+def run_suite(dataset, repeat=3, reads=20, only=None, log=None):
+    """
+    Sync every payload in `dataset` and then read it back.
+
+    Returns {scenario name: metrics}; names look like 'POST kot_sales_api'.
+    """
+    client = Client()
+    results = {}
+    for name, payload in dataset.items():
+        if only and name not in only:
+            continue
+        url = reverse(name)
+        view = resolve(url).func.view_class
+
+        def empty_table():
+            forget_syncs()
+            view.model.objects.all().delete()
+
+        for method, scenario in (
+            ('POST', lambda: run_sync(client, url, payload, repeat, before=empty_table)),
+            ('RESYNC', lambda: run_sync(client, url, payload, repeat, before=forget_syncs)),
+            ('REPLAY', lambda: run_sync(client, url, payload, repeat)),
+            ('GET', lambda: run_read(client, url, len(payload), reads)),
+        ):
+            key = f'{method} {name}'
+            if log:
+                log(f'{key} ({len(payload)} rows)...')
+            results[key] = scenario()
+    return results
+
+
+def environment():
+    return {
+        'vendor': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline, tolerance=10.0):
+    """
+    Compare `results` against a saved baseline.
+
+    Returns a list of (scenario, metric, baseline, current, change %,
+    regressed) tuples. A metric regresses when it moves the wrong way by
+    more than `tolerance` percent.
+    """
+    rows = []
+    for scenario, current in results.items():
+        previous = baseline.get(scenario)
+        if not previous:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old * 100.0
+            worse = -change if metric in HIGHER_IS_BETTER else change
+            rows.append((scenario, metric, old, new, round(change, 1), worse > tolerance))
+    return rows
+
+
+def load_baseline(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def save_baseline(path, results, meta):
+    with open(path, 'w') as fh:
+        json.dump({'meta': meta, 'results': results}, fh, indent=2, sort_keys=True)
@@ -0,0 +1,125 @@
+"""
+Synthetic POS data shaped like the payloads the shop clients POST.
+
+Everything is generated from a seeded random.Random so two runs with the
+same seed and scale produce byte-identical payloads.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+KITCHENS = ['MAIN', 'TANDOOR', 'CHINESE', 'JUICE', 'BAKERY']
+CATEGORIES = ['STARTER', 'MAIN COURSE', 'BREADS', 'RICE', 'BEVERAGES', 'DESSERT', 'SNACKS']
+
+# Rough shape of one outlet's data, relative to the number of KOT lines.
+LINES_PER_BILL = 4
+BILL_DAYS = 30
+ITEM_COUNT = 600
+USER_COUNT = 25
+CANCELLED_RATIO = 0.02
+
+
+def _money(rng, low, high, places=2):
+    return f'{rng.uniform(low, high):.{places}f}'
+
+
+def generate_users(rng, count=USER_COUNT):
+    return [
+        {'id': f'USER{n:03d}', 'password': f'{rng.randrange(10 ** 6):06d}'}
+        for n in range(1, count + 1)
+    ]
+
+
+def generate_items(rng, count=ITEM_COUNT):
+    items = []
+    for n in range(1, count + 1):
+        base = rng.uniform(20, 600)
+        item = {
+            'item_code': f'I{n:05d}',
+            'item_name': f'ITEM {n:05d}',
+            'rate': f'{base:.2f}',
+            'kitchen': rng.choice(KITCHENS),
+            'category': rng.choice(CATEGORIES),
+        }
+        # rate1..rate7 are the tier prices (AC hall, parcel, delivery apps...)
+        for tier in range(1, 8):
+            item[f'rate{tier}'] = f'{base * (1 + tier * 0.05):.2f}'
+        items.append(item)
+    return items
+
+
+def generate_bills(rng, count, last_day, days=BILL_DAYS, first_billno=1, users=None):
+    """Bills spread evenly over the `days` days ending on `last_day`."""
+    users = users or [f'USER{n:03d}' for n in range(1, USER_COUNT + 1)]
+    first_day = last_day - timedelta(days=days - 1)
+    per_day = max(count // days, 1)
+    bills = []
+    for n in range(count):
+        day = first_day + timedelta(days=min(n // per_day, days - 1))
+        stamp = datetime.combine(day, time(10)) + timedelta(seconds=rng.randrange(13 * 3600))
+        bills.append({
+            'billno': first_billno + n,
+            'time': stamp.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'user': rng.choice(users),
+            'amount': _money(rng, 50, 5000, 5),
+            'date': day.isoformat(),
+        })
+    return bills
+
+
+def generate_kot_lines(rng, bills, items, lines_per_bill=LINES_PER_BILL, first_slno=1):
+    lines = []
+    slno = first_slno
+    for bill in bills:
+        for _ in range(lines_per_bill):
+            item = rng.choice(items)
+            lines.append({
+                'slno': slno,
+                'billno': bill['billno'],
+                'item': item['item_code'],
+                'qty': f'{rng.choice([1, 1, 1, 2, 2, 3, 0.5]):.3f}',
+                'rate': f'{float(item["rate"]):.5f}',
+            })
+            slno += 1
+    return lines
+
+
+def generate_cancelled(rng, bills, ratio=CANCELLED_RATIO):
+    picked = rng.sample(bills, int(len(bills) * ratio))
+    return [
+        {
+            'billno': bill['billno'],
+            'date': bill['date'],
+            'creditcard': rng.choice(['', 'VISA', 'MASTER']),
+            'colnstatus': rng.choice(['Y', 'N']),
+        }
+        for bill in sorted(picked, key=lambda b: b['billno'])
+    ]
+
+
+def generate_dataset(kot_rows=100000, seed=2024, last_day=None):
+    """
+    Build one payload per sync endpoint, keyed by URL name.
+
+    `kot_rows` drives the scale: the month table holds one bill per
+    LINES_PER_BILL KOT lines and dine_bill holds the last day of it.
+    """
+    rng = random.Random(seed)
+    last_day = last_day or date(2024, 1, 31)
+
+    users = generate_users(rng)
+    items = generate_items(rng)
+    month_bills = generate_bills(
+        rng, max(kot_rows // LINES_PER_BILL, 1), last_day,
+        users=[u['id'] for u in users],
+    )
+    today = last_day.isoformat()
+    day_bills = [bill for bill in month_bills if bill['date'] == today]
+
+    return {
+        'acc_users_api': users,
+        'items_api': items,
+        'bills_api': day_bills,
+        'bills_month_api': month_bills,
+        'kot_sales_api': generate_kot_lines(rng, month_bills, items)[:kot_rows],
+        'cancelled_bills_api': generate_cancelled(rng, month_bills),
+    }
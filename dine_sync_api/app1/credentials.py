@@ -0,0 +1,118 @@
+"""
+Login checks for POS clients against the synced acc_users table.
+
+acc_users.pass_hash holds a salted hash of each password, computed when the
+table is synced (before its transaction opens). Verifying a login runs the
+hasher, so recent successful verifications are remembered in a small
+per-process LRU;
+entries are keyed by a digest of the outlet, login, stored hash and
+password, so a changed password never matches an old entry and no
+plaintext is kept.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, get_hasher, make_password
+
+from .models import AccUsers
+
+
+def _uses_iterations(hasher):
+    # the PBKDF2 hashers take an iteration count and store it in the hash
+    return bool(settings.ACC_USERS_PASSWORD_ITERATIONS) and hasattr(hasher, 'iterations')
+
+
+def hash_password(password):
+    hasher = get_hasher(settings.ACC_USERS_PASSWORD_HASHER)
+    if _uses_iterations(hasher):
+        return hasher.encode(password, hasher.salt(), settings.ACC_USERS_PASSWORD_ITERATIONS)
+    return make_password(password, hasher=hasher)
+
+
+def hash_is_current(pass_hash):
+    """True if pass_hash was made with the configured hasher and cost"""
+    hasher = get_hasher(settings.ACC_USERS_PASSWORD_HASHER)
+    if not pass_hash.startswith(hasher.algorithm + '$'):
+        return False
+    if _uses_iterations(hasher):
+        return hasher.decode(pass_hash)['iterations'] == settings.ACC_USERS_PASSWORD_ITERATIONS
+    return not hasher.must_update(pass_hash)
+
+
+def hash_passwords(rows, existing):
+    """
+    Set pass_hash on validated acc_users rows before a sync writes them.
+
+    `existing` maps user_id to (pass_field, pass_hash) of the stored rows;
+    users whose password did not change keep their hash, so a resync neither
+    rehashes nor rewrites them. Hashes made with another hasher or cost are
+    redone.
+    """
+    changed = []
+    for row in rows:
+        stored_pass, stored_hash = existing.get(row['user_id'], (None, ''))
+        if stored_hash and stored_pass == row['pass_field'] and hash_is_current(stored_hash):
+            row['pass_hash'] = stored_hash
+        else:
+            changed.append(row)
+    if not changed:
+        return
+    # PBKDF2 runs in OpenSSL without the GIL, so new passwords hash in parallel
+    with ThreadPoolExecutor(max_workers=min(len(changed), os.cpu_count() or 1)) as pool:
+        hashes = pool.map(hash_password, [row['pass_field'] for row in changed])
+        for row, pass_hash in zip(changed, hashes):
+            row['pass_hash'] = pass_hash
+
+
+class VerifiedLogins:
+    """Thread-safe LRU set of login digests."""
+
+    def __init__(self, size):
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, digest):
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                return True
+            return False
+
+    def add(self, digest):
+        with self._lock:
+            self._entries[digest] = True
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_verified = VerifiedLogins(settings.ACC_USERS_VERIFY_CACHE_SIZE)
+
+
+def login_digest(outlet, user_id, password, pass_hash):
+    return hashlib.blake2b('\0'.join((outlet, user_id, pass_hash, password)).encode()).digest()
+
+
+def verify_login(outlet, user_id, password):
+    """True if `password` is the outlet's password for `user_id`"""
+    pass_hash = AccUsers.objects.filter(outlet=outlet, user_id=user_id).values_list('pass_hash', flat=True).first()
+    if not pass_hash:
+        # run the hasher anyway so unknown logins take as long as wrong passwords
+        hash_password(password)
+        return False
+    digest = login_digest(outlet, user_id, password, pass_hash)
+    if digest in _verified:
+        return True
+    if check_password(password, pass_hash):
+        _verified.add(digest)
+        return True
+    return False
@@ -0,0 +1,160 @@
+"""
+Sync notifications behind GET /api/events/ (server-sent events).
+
+Every committed sync publishes a small event (outlet, table, generation,
+row counts) to a channel that all worker processes can listen on:
+
+    'file'      an append-only JSON-lines file (SYNC_EVENTS_FILE) that
+                listeners tail; fine for every worker on one host
+    'postgres'  LISTEN/NOTIFY on the default database; needs psycopg >= 3.2
+                for the async listener
+
+Picked with SYNC_EVENTS_BACKEND. Events are hints for clients to refetch,
+not a log: a listener that reconnects starts from the current generations.
+"""
+import asyncio
+import json
+import os
+
+from django.conf import settings
+from django.db import connection, transaction
+
+CHANNEL = 'dine_sync'
+
+
+def sync_event(outlet, table_name, generation, result):
+    """The event published for a committed sync, from its response body"""
+    return {
+        'outlet': outlet,
+        'table': table_name,
+        'generation': generation,
+        'rows': result.get('created', 0),
+        'changed': sum(result.get(k, 0) for k in ('inserted', 'updated', 'deleted')),
+    }
+
+
+class FileChannel:
+    """Events appended as JSON lines to a shared file, tailed by listeners."""
+
+    def __init__(self, path, max_bytes, poll_interval):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+
+    def publish(self, event):
+        transaction.on_commit(lambda: self._append(event))
+
+    def _append(self, event):
+        line = (json.dumps(event, separators=(',', ':')) + '\n').encode()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        try:
+            if os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + '.1')  # listeners follow the new inode
+        except FileNotFoundError:
+            pass
+        # one O_APPEND write per event, so lines from several workers never interleave
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def _open(self, at_end):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fh = open(self.path, 'a+b')
+        fh.seek(0, os.SEEK_END if at_end else os.SEEK_SET)
+        return fh
+
+    async def subscribe(self, timeout):
+        """
+        Yield events published after the call; yields None once listening
+        and whenever `timeout` seconds pass without an event.
+        """
+        fh = self._open(at_end=True)
+        pending = b''
+        try:
+            yield None
+            idle = 0.0
+            while True:
+                chunk = fh.read()
+                if not chunk:
+                    try:
+                        rotated = os.stat(self.path).st_ino != os.fstat(fh.fileno()).st_ino
+                    except FileNotFoundError:
+                        rotated = True
+                    if rotated:
+                        fh.close()
+                        fh = self._open(at_end=False)
+                        pending = b''
+                        continue
+                    if idle >= timeout:
+                        idle = 0.0
+                        yield None
+                    await asyncio.sleep(self.poll_interval)
+                    idle += self.poll_interval
+                    continue
+                idle = 0.0
+                *lines, pending = (pending + chunk).split(b'\n')
+                for line in lines:
+                    if line:
+                        yield json.loads(line)
+        finally:
+            fh.close()
+
+
+class PostgresChannel:
+    """Events sent with NOTIFY, delivered by Postgres when the sync commits."""
+
+    def publish(self, event):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, json.dumps(event, separators=(',', ':'))])
+
+    def _conninfo(self):
+        from psycopg.conninfo import make_conninfo
+
+        db = settings.DATABASES['default']
+        return make_conninfo(
+            dbname=db['NAME'], user=db.get('USER') or None, password=db.get('PASSWORD') or None,
+            host=db.get('HOST') or None, port=db.get('PORT') or None,
+        )
+
+    async def subscribe(self, timeout):
+        """Same contract as FileChannel.subscribe, on a dedicated LISTEN connection"""
+        try:
+            import psycopg
+        except ImportError:
+            raise RuntimeError("SYNC_EVENTS_BACKEND = 'postgres' needs psycopg >= 3.2 installed")
+
+        conn = await psycopg.AsyncConnection.connect(self._conninfo(), autocommit=True)
+        try:
+            await conn.execute(f'LISTEN {CHANNEL}')
+            yield None
+            while True:
+                async for notify in conn.notifies(timeout=timeout):
+                    yield json.loads(notify.payload)
+                yield None
+        finally:
+            await conn.close()
+
+
+_channel = None
+
+
+def get_channel():
+    global _channel
+    if _channel is None:
+        backend = settings.SYNC_EVENTS_BACKEND
+        if backend == 'postgres':
+            _channel = PostgresChannel()
+        elif backend == 'file':
+            _channel = FileChannel(
+                settings.SYNC_EVENTS_FILE, settings.SYNC_EVENTS_FILE_MAX_BYTES, settings.SYNC_EVENTS_POLL_SECONDS
+            )
+        else:
+            raise ValueError(f"Unknown SYNC_EVENTS_BACKEND {backend!r}, expected 'file' or 'postgres'")
+    return _channel
+
+
+def publish(outlet, table_name, generation, result):
+    """Announce a sync; call inside its transaction, the event goes out on commit."""
+    get_channel().publish(sync_event(outlet, table_name, generation, result))
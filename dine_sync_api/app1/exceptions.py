@@ -0,0 +1,21 @@
+"""
+DRF exception handling in the API's response shape.
+
+Views answer errors with {'status': 'error', 'message': ...}; DRF's own
+handler renders the exceptions raised by the request helpers (ParseError
+for bad query parameters, IdempotencyConflict, Throttled) as
+{'detail': ...}. This handler keeps DRF's status codes and headers
+(Retry-After on a 429) and rewrites the body.
+"""
+from rest_framework.views import exception_handler
+
+
+def api_exception_handler(exc, context):
+    response = exception_handler(exc, context)
+    if response is None:
+        return None
+    if isinstance(response.data, dict) and set(response.data) == {'detail'}:
+        response.data = {'status': 'error', 'message': str(response.data['detail'])}
+    else:  # field errors from a ValidationError
+        response.data = {'status': 'error', 'message': 'Invalid request', 'errors': response.data}
+    return response
@@ -0,0 +1,150 @@
+"""
+Bulk exports of the bill history tables for accountants and BI jobs.
+
+    csv      streamed; on Postgres straight from COPY (...) TO STDOUT, so
+             rows never become Python objects, elsewhere through the csv
+             module. Decimals are written exactly as stored.
+    parquet  columnar, one row group per EXPORT_BATCH_ROWS rows
+    arrow    Arrow IPC stream, same batches
+
+Parquet and Arrow keep DecimalFields as decimal128 with the model's
+precision and scale, dates as date32 and times as UTC timestamps. They
+need pyarrow, which is optional (without it only csv is offered) and only
+imported by the first columnar export, so workers boot without it.
+"""
+import csv
+import io
+import tempfile
+
+from django.conf import settings
+from django.db import connections, models
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+
+class ExportUnavailable(Exception):
+    """The requested format needs an optional dependency that is not installed."""
+
+
+def export_fields(model):
+    """
+    Model fields an export carries, in table order: the POS columns, without
+    the surrogate key, outlet and the is_cancelled flag derived at sync time.
+    """
+    return [
+        f for f in model._meta.concrete_fields
+        if not isinstance(f, models.AutoField) and f.name not in ('outlet', 'is_cancelled')
+    ]
+
+
+def _copy_supported(connection):
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def stream_csv(queryset, fields):
+    """CSV bytes with a header row named after the table's columns."""
+    rows = queryset.values_list(*[f.name for f in fields])
+    connection = connections[rows.db]  # the read replica, when routed to one
+    if _copy_supported(connection):
+        return _copy_csv(connection, rows)
+    return _python_csv(rows, [f.column for f in fields])
+
+
+def _copy_csv(connection, rows):
+    # the SELECT's output columns are the table's column names, which COPY uses for the header
+    sql, params = rows.query.sql_with_params()
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(f'COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)', params) as copy:
+            for block in copy:
+                yield bytes(block)
+
+
+def _python_csv(rows, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    writer.writerow(header)
+    batch_rows = settings.EXPORT_BATCH_ROWS
+    for n, row in enumerate(rows.iterator(chunk_size=batch_rows), start=1):
+        writer.writerow(row)
+        if n % batch_rows == 0:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def load_pyarrow(export_format):
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportUnavailable(f'{export_format} export needs pyarrow installed; export as .csv instead')
+    return pyarrow
+
+
+def arrow_type(pyarrow, field):
+    if isinstance(field, models.DecimalField):
+        return pyarrow.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp('us', tz='UTC')
+    if isinstance(field, models.DateField):
+        return pyarrow.date32()
+    if isinstance(field, models.IntegerField):
+        return pyarrow.int64()
+    return pyarrow.string()
+
+
+def arrow_batches(pyarrow, queryset, fields):
+    """pyarrow RecordBatches of EXPORT_BATCH_ROWS rows, plus the schema they share"""
+    schema = pyarrow.schema([
+        pyarrow.field(f.column, arrow_type(pyarrow, f), nullable=f.null) for f in fields
+    ])
+
+    def batches():
+        batch_rows = settings.EXPORT_BATCH_ROWS
+        chunk = []
+        for row in queryset.values_list(*[f.name for f in fields]).iterator(chunk_size=batch_rows):
+            chunk.append(row)
+            if len(chunk) == batch_rows:
+                yield to_batch(chunk)
+                chunk = []
+        if chunk:
+            yield to_batch(chunk)
+
+    def to_batch(chunk):
+        columns = zip(*chunk)
+        return pyarrow.record_batch(
+            [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+        )
+
+    return schema, batches()
+
+
+def write_columnar(queryset, fields, export_format):
+    """
+    The export as a temporary file, rewound for reading.
+
+    Parquet keeps its footer at the end of the file, so columnar exports
+    are spooled to disk rather than streamed.
+    """
+    pyarrow = load_pyarrow(export_format)
+    schema, batches = arrow_batches(pyarrow, queryset, fields)
+    out = tempfile.TemporaryFile()
+    sink = pyarrow.PythonFile(out, mode='w')
+    if export_format == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(sink, schema, compression=settings.EXPORT_PARQUET_COMPRESSION)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in batches:
+            writer.write_batch(batch)
+    out.seek(0)
+    return out
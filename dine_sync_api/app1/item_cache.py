@@ -0,0 +1,100 @@
+"""
+Process-local, read-only index of tb_item_master per outlet.
+
+The item master is small, read constantly and written only by its sync,
+so each worker keeps an immutable copy and rebuilds it lazily when the
+outlet's tb_item_master sync generation moves on (see
+sync.current_generation). Readers never lock: a rebuild swaps in a new
+ItemIndex and old references stay valid.
+"""
+import threading
+from collections import namedtuple
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.db import DEFAULT_DB_ALIAS
+
+from .models import TbItemMaster
+from .sync import current_generation
+
+TABLE_NAME = 'tb_item_master'
+RATE_FIELDS = ('rate', 'rate1', 'rate2', 'rate3', 'rate4', 'rate5', 'rate6', 'rate7')
+
+# rates is a tuple of the tier prices (rate, rate1..rate7) as exact decimal
+# strings, already formatted the way the API renders them.
+ItemRecord = namedtuple('ItemRecord', ['item_code', 'item_name', 'kitchen', 'category', 'rates'])
+
+
+class ItemIndex:
+    """Items keyed by item_code, plus item_code tuples per category and per kitchen."""
+
+    __slots__ = ('generation', 'by_code', 'by_category', 'by_kitchen')
+
+    def __init__(self, generation, records):
+        by_category = {}
+        by_kitchen = {}
+        for record in records:
+            by_category.setdefault(record.category, []).append(record.item_code)
+            by_kitchen.setdefault(record.kitchen, []).append(record.item_code)
+        self.generation = generation
+        self.by_code = MappingProxyType({record.item_code: record for record in records})
+        self.by_category = MappingProxyType({k: tuple(v) for k, v in by_category.items()})
+        self.by_kitchen = MappingProxyType({k: tuple(v) for k, v in by_kitchen.items()})
+
+    def __len__(self):
+        return len(self.by_code)
+
+    def get(self, item_code):
+        return self.by_code.get(item_code)
+
+    def select(self, category=None, kitchen=None):
+        """Records in item_code order, optionally limited to a category and/or kitchen."""
+        codes = self.by_code.keys()
+        if category is not None:
+            codes = self.by_category.get(category, ())
+        if kitchen is not None:
+            in_kitchen = self.by_kitchen.get(kitchen, ())
+            codes = in_kitchen if category is None else set(codes).intersection(in_kitchen)
+        return [self.by_code[code] for code in sorted(codes)]
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def _format_rate(value, quantum):
+    return None if value is None else format(value.quantize(quantum), 'f')
+
+
+def build_index(outlet, generation):
+    quantums = [
+        Decimal(1).scaleb(-TbItemMaster._meta.get_field(name).decimal_places) for name in RATE_FIELDS
+    ]
+    # from the primary: a lagging replica would freeze stale items under the new generation
+    rows = TbItemMaster.objects.using(DEFAULT_DB_ALIAS).filter(outlet=outlet).order_by('item_code').values_list(
+        'item_code', 'item_name', 'kitchen', 'category', *RATE_FIELDS
+    )
+    records = [
+        ItemRecord(code, name, kitchen, category, tuple(map(_format_rate, rates, quantums)))
+        for code, name, kitchen, category, *rates in rows
+    ]
+    return ItemIndex(generation, records)
+
+
+def item_index(outlet):
+    """The outlet's current ItemIndex, rebuilt if its item master was synced since."""
+    generation = current_generation(outlet, TABLE_NAME)
+    index = _indexes.get(outlet)
+    if index is not None and index.generation == generation:
+        return index
+    with _lock:
+        index = _indexes.get(outlet)
+        if index is None or index.generation != generation:
+            index = _indexes[outlet] = build_index(outlet, generation)
+    return index
+
+
+def clear():
+    """Drop every cached index (tests, benchmarks)."""
+    with _lock:
+        _indexes.clear()
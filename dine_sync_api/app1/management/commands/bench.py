@@ -0,0 +1,111 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import resolve, reverse
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from app1.bench import runner
+from app1.bench.render import compare_render_paths
+from app1.bench.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every sync POST and read GET against a throwaway test database '
+        'filled with synthetic POS data. Use DJANGO_SETTINGS_MODULE=dine_sync_api.settings_bench '
+        'to pick SQLite or a local Postgres.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kot-rows', type=int, default=100000,
+                            help='Size of the dine_kot_sales_detail payload; the other tables scale from it.')
+        parser.add_argument('--seed', type=int, default=2024)
+        parser.add_argument('--repeat', type=int, default=3, help='POSTs per sync scenario.')
+        parser.add_argument('--reads', type=int, default=20, help='GETs per read scenario.')
+        parser.add_argument('--only', nargs='*', metavar='URL_NAME',
+                            help='Limit to some endpoints, e.g. kot_sales_api bills_month_api.')
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the results as a new baseline.')
+        parser.add_argument('--baseline', metavar='PATH', help='Compare the results against a saved baseline.')
+        parser.add_argument('--tolerance', type=float, default=10.0,
+                            help='Percent a metric may get worse before it counts as a regression.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+        parser.add_argument('--render', action='store_true',
+                            help='Also time the GET rendering path (serializer + JSONRenderer) against '
+                                 'serialize_rows() + FastJSONRenderer on the loaded tables.')
+        parser.add_argument('--json', action='store_true', help='Print raw results as JSON.')
+
+    def handle(self, *args, **options):
+        dataset = generate_dataset(kot_rows=options['kot_rows'], seed=options['seed'])
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = runner.run_suite(
+                dataset,
+                repeat=options['repeat'],
+                reads=options['reads'],
+                only=options['only'],
+                log=lambda msg: self.stderr.write(msg),
+            )
+            meta = dict(runner.environment(), kot_rows=options['kot_rows'], seed=options['seed'])
+            render = self._render(dataset, options) if options['render'] else None
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['json']:
+            self.stdout.write(json.dumps({'meta': meta, 'results': results, 'render': render}, indent=2))
+        else:
+            self._print_results(meta, results)
+            if render:
+                self._print_render(render)
+
+        if options['save_baseline']:
+            runner.save_baseline(options['save_baseline'], results, meta)
+            self.stdout.write(f"Baseline saved to {options['save_baseline']}")
+
+        if options['baseline']:
+            baseline = runner.load_baseline(options['baseline'])
+            rows = runner.compare(results, baseline['results'], options['tolerance'])
+            regressions = self._print_comparison(baseline.get('meta', {}), rows)
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{regressions} metric(s) regressed by more than {options["tolerance"]}%')
+
+    def _print_results(self, meta, results):
+        self.stdout.write(
+            f"{meta['vendor']} | python {meta['python']} | django {meta['django']} | kot_rows={meta['kot_rows']}"
+        )
+        self.stdout.write(f"{'scenario':<28}{'rows':>8}{'rows/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'peak MB':>9}  status")
+        for name, r in results.items():
+            self.stdout.write(
+                f"{name:<28}{r['rows']:>8}{r['rows_per_sec'] or 0:>12.0f}{r['p50_ms']:>10.1f}"
+                f"{r['p99_ms']:>10.1f}{r['peak_rss_mb'] or 0:>9.1f}  {r['status_codes']}"
+            )
+
+    def _render(self, dataset, options):
+        results = {}
+        for name in dataset:
+            if options['only'] and name not in options['only']:
+                continue
+            view = resolve(reverse(name)).func.view_class
+            self.stderr.write(f'RENDER {name}...')
+            results[name] = compare_render_paths(view.model.objects.all(), view.serializer_class, options['repeat'])
+        return results
+
+    def _print_render(self, render):
+        self.stdout.write(f"\n{'GET rendering':<28}{'rows':>8}{'serializer ms':>15}{'bypass ms':>11}{'speedup':>9}  identical")
+        for name, r in render.items():
+            self.stdout.write(
+                f"{name:<28}{r['rows']:>8}{r['serializer_ms']:>15.1f}{r['bypass_ms']:>11.1f}"
+                f"{r['speedup'] or 0:>8.1f}x  {r['identical']}"
+            )
+
+    def _print_comparison(self, baseline_meta, rows):
+        self.stdout.write(f"\nAgainst baseline ({baseline_meta.get('vendor', '?')}, kot_rows={baseline_meta.get('kot_rows', '?')}):")
+        regressions = 0
+        for scenario, metric, old, new, change, regressed in rows:
+            flag = 'REGRESSED' if regressed else ''
+            regressions += regressed
+            self.stdout.write(f'{scenario:<28}{metric:<14}{old:>12}{new:>12}{change:>+9.1f}%  {flag}')
+        return regressions
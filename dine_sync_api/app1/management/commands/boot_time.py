@@ -0,0 +1,68 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from app1.bench import runner
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure worker boot-to-first-response time: start fresh Python processes that load the '
+        'WSGI application and answer one GET, with the full settings and with the lean API profile. '
+        'Use DJANGO_SETTINGS_MODULE=dine_sync_api.settings_bench (BENCH_PROFILE selects the profile).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='/api/items/price_list/', help='Path of the first request.')
+        parser.add_argument('--runs', type=int, default=5, help='Processes started per profile.')
+        parser.add_argument('--profiles', nargs='*', default=['full', 'api'], choices=['full', 'api'])
+        parser.add_argument('--migrate', action='store_true',
+                            help='Migrate the configured database first, so the request finds its tables.')
+        parser.add_argument('--json', action='store_true', help='Print raw results as JSON.')
+
+    def handle(self, *args, **options):
+        if options['migrate']:
+            call_command('migrate', verbosity=0)
+
+        results = {}
+        for profile in options['profiles']:
+            env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ['DJANGO_SETTINGS_MODULE'])
+            env.pop('BENCH_PROFILE', None)
+            if profile == 'api':
+                env['BENCH_PROFILE'] = 'api'
+            runs = [self._boot(env, options['url']) for _ in range(options['runs'])]
+            results[profile] = {
+                metric: runner.percentile([run[metric] for run in runs], 50)
+                for metric in ('process_ms', 'boot_ms', 'first_response_ms', 'second_response_ms')
+            }
+            results[profile]['status_codes'] = sorted({run['status'] for run in runs})
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"median of {options['runs']} fresh processes, GET {options['url']}")
+        self.stdout.write(f"{'profile':<10}{'process ms':>12}{'boot ms':>10}{'1st req ms':>12}{'2nd req ms':>12}  status")
+        for profile, r in results.items():
+            self.stdout.write(
+                f"{profile:<10}{r['process_ms']:>12.1f}{r['boot_ms']:>10.1f}{r['first_response_ms']:>12.1f}"
+                f"{r['second_response_ms']:>12.1f}  {r['status_codes']}"
+            )
+
+    def _boot(self, env, url):
+        """One fresh process; process_ms runs from spawning it to its first response."""
+        started = time.time()
+        proc = subprocess.run(
+            [sys.executable, '-m', 'app1.bench.boot', url],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f'Boot process failed:\n{proc.stderr}')
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        run['process_ms'] = round((run['answered_at'] - started) * 1000, 1)
+        return run
@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from app1.bench import load
+
+
+class Command(BaseCommand):
+    help = (
+        'Capacity run: N simulated POS terminals syncing periodically and M dashboards polling GETs. '
+        'Without --target the requests go through this process against a throwaway test database '
+        '(use DJANGO_SETTINGS_MODULE=dine_sync_api.settings_bench); with --target they go to a running '
+        'server, which keeps the synced rows, so point it at a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', metavar='URL',
+                            help='Base URL of a running server, e.g. http://127.0.0.1:8000. Default: in-process.')
+        parser.add_argument('--terminals', type=int, default=10, help='Simulated POS terminals, one outlet each.')
+        parser.add_argument('--dashboards', type=int, default=20, help='Simulated dashboards polling GETs.')
+        parser.add_argument('--duration', type=float, default=60.0, help='Seconds to run.')
+        parser.add_argument('--sync-interval', type=float, default=30.0, help='Seconds between a terminal\'s syncs.')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds between a dashboard\'s GETs.')
+        parser.add_argument('--full-ratio', type=float, default=0.1,
+                            help='Share of syncs after the first that post every table instead of a delta.')
+        parser.add_argument('--bills-per-sync', type=int, default=5, help='New bills a terminal rings up per delta.')
+        parser.add_argument('--kot-rows', type=int, default=2000,
+                            help='KOT lines of each outlet\'s initial data; the other tables scale from it.')
+        parser.add_argument('--read-mix', default=None, metavar='NAME=WEIGHT,...',
+                            help='Dashboard GET weights by URL name, default: ' + ','.join(
+                                f'{name}={weight}' for name, weight in load.DEFAULT_READ_MIX.items()))
+        parser.add_argument('--outlet-prefix', default='load', help='Simulated outlets are <prefix>0000, <prefix>0001...')
+        parser.add_argument('--seed', type=int, default=2024)
+        parser.add_argument('--json', action='store_true', help='Print the raw report as JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            read_mix = load.parse_read_mix(options['read_mix']) if options['read_mix'] else None
+            transport = load.HttpTransport(options['target']) if options['target'] else load.InProcessTransport()
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options['terminals'] < 1 or options['dashboards'] < 0:
+            raise CommandError('Need at least one terminal and no negative number of dashboards')
+
+        run = dict(
+            terminals=options['terminals'], dashboards=options['dashboards'], duration=options['duration'],
+            sync_interval=options['sync_interval'], poll_interval=options['poll_interval'],
+            full_ratio=options['full_ratio'], read_mix=read_mix, kot_rows=options['kot_rows'],
+            bills_per_sync=options['bills_per_sync'], outlet_prefix=options['outlet_prefix'], seed=options['seed'],
+            log=lambda msg: self.stderr.write(msg),
+        )
+        if options['target']:
+            report = load.run_load(transport, **run)
+        else:
+            report = self._in_process(transport, run)
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self._print_report(report)
+
+    def _in_process(self, transport, run):
+        if connection.vendor == 'sqlite':
+            # every client thread needs its own connection to the test database,
+            # which the default in-memory SQLite test database cannot share
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'dine_sync_load.sqlite3')
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            return load.run_load(transport, **run)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def _print_report(self, report):
+        meta = report['meta']
+        self.stdout.write(
+            f"{meta['transport']} ({meta['vendor']}) | {meta['terminals']} terminals every {meta['sync_interval_s']:g}s "
+            f"({meta['full_ratio']:.0%} full) | {meta['dashboards']} dashboards every {meta['poll_interval_s']:g}s "
+            f"| {meta['elapsed_s']}s"
+        )
+        self.stdout.write(
+            f"{'scenario':<30}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+            f"{'errors':>8}{'429s':>6}"
+        )
+        rows = list(report['scenarios'].items())
+        if report['totals']:
+            rows.append(('all requests', report['totals']))
+        for name, r in rows:
+            self.stdout.write(
+                f"{name:<30}{r['requests']:>9}{r['per_sec']:>9.2f}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}"
+                f"{r['p99_ms']:>9.1f}{r['max_ms']:>9.1f}{r['errors']:>8}{r['throttled']:>6}"
+            )
+
+        db = report['db_connections']
+        if db['peak'] is None:
+            self.stdout.write('\nDB connections: not sampled')
+        else:
+            opened = f", {db['opened']} opened" if db['opened'] is not None else ''
+            self.stdout.write(f"\nDB connections ({db['source']}): peak {db['peak']}, mean {db['mean']}{opened}")
+        self.stdout.write(f"Sync cycles longer than the interval: {report['sync_overruns']}")
+        for name, message in report['failures'].items():
+            self.stdout.write(f'First failure of {name}: {message}')
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:05
+
+from django.db import migrations, models
+
+
+def create_missing(apps, schema_editor):
+    # cancelled_bills, dine_bill_month and dine_bill.date already exist in
+    # databases the POS sync filled before these models were added; only
+    # create what is missing (fresh and test databases)
+    connection = schema_editor.connection
+    tables = connection.introspection.table_names()
+    for model_name in ('CancelledBills', 'DineBillMonth'):
+        model = apps.get_model('app1', model_name)
+        if model._meta.db_table not in tables:
+            schema_editor.create_model(model)
+    dine_bill = apps.get_model('app1', 'DineBill')
+    with connection.cursor() as cursor:
+        columns = {c.name for c in connection.introspection.get_table_description(cursor, dine_bill._meta.db_table)}
+    field = dine_bill._meta.get_field('date_field')
+    if field.column not in columns:
+        schema_editor.add_field(dine_bill, field)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0003_dinebill_dinekotsalesdetail'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.CreateModel(
+                name='CancelledBills',
+                fields=[
+                    ('billno', models.DecimalField(decimal_places=0, max_digits=10, primary_key=True, serialize=False)),
+                    ('date_field', models.DateField(blank=True, db_column='date', null=True)),
+                    ('creditcard', models.CharField(blank=True, max_length=30, null=True)),
+                    ('colnstatus', models.CharField(blank=True, max_length=1, null=True)),
+                ],
+                options={
+                    'db_table': 'cancelled_bills',
+                },
+            ),
+            migrations.CreateModel(
+                name='DineBillMonth',
+                fields=[
+                    ('billno', models.DecimalField(decimal_places=0, max_digits=10, primary_key=True, serialize=False)),
+                    ('time_field', models.DateTimeField(blank=True, db_column='time', null=True)),
+                    ('user_field', models.CharField(blank=True, db_column='user', max_length=15, null=True)),
+                    ('amount', models.DecimalField(blank=True, decimal_places=5, max_digits=13, null=True)),
+                    ('date_field', models.DateField(blank=True, db_column='date', null=True)),
+                ],
+                options={
+                    'db_table': 'dine_bill_month',
+                },
+            ),
+            migrations.AddField(
+                model_name='dinebill',
+                name='date_field',
+                field=models.DateField(blank=True, db_column='date', null=True),
+            ),
+        ]),
+        # the tables hold POS data, so unapplying leaves them in place
+        migrations.RunPython(create_missing, migrations.RunPython.noop),
+    ]
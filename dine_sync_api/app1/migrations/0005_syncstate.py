@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0004_cancelledbills_dinebillmonth_dinebill_date_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table_name', models.CharField(max_length=64, unique=True)),
+                ('generation', models.PositiveBigIntegerField(default=0)),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=64)),
+                ('idempotency_key', models.CharField(blank=True, max_length=255, null=True)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'sync_state',
+            },
+        ),
+    ]
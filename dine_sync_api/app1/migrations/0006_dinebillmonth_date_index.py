@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0005_syncstate'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dinebill',
+            name='date_field',
+            field=models.DateField(blank=True, db_column='date', db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='dinebillmonth',
+            name='date_field',
+            field=models.DateField(blank=True, db_column='date', db_index=True, null=True),
+        ),
+    ]
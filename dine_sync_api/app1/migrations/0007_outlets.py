@@ -0,0 +1,157 @@
+# Multi-outlet tenancy: every synced table gets an `outlet` column and the
+# natural keys (billno, slno, user id, item_code) become unique per outlet.
+#
+# The five tables whose natural key was the primary key get a surrogate
+# `row_id` primary key. Existing rows are numbered in place, the old key
+# is demoted, then row_id becomes an auto-increment primary key whose
+# sequence is moved past the numbered rows. Existing data lands in the
+# 'default' outlet.
+
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+PK_SWAPS = [
+    # (model, natural key)
+    ('accusers', 'user_id'),
+    ('dinebill', 'billno'),
+    ('dinebillmonth', 'billno'),
+    ('dinekotsalesdetail', 'slno'),
+    ('cancelledbills', 'billno'),
+]
+
+
+def number_rows(apps, schema_editor):
+    db = schema_editor.connection.alias
+    for model_name, key in PK_SWAPS:
+        model = apps.get_model('app1', model_name)
+        rows = list(model.objects.using(db).only(key).order_by(key))
+        for row_id, row in enumerate(rows, start=1):
+            row.row_id = row_id
+        model.objects.using(db).bulk_update(rows, ['row_id'], batch_size=1000)
+
+
+def reset_row_id_sequences(apps, schema_editor):
+    connection = schema_editor.connection
+    models_ = [apps.get_model('app1', model_name) for model_name, _ in PK_SWAPS]
+    statements = connection.ops.sequence_reset_sql(no_style(), models_)
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+
+
+def swap_primary_key(model_name, key, field):
+    return [
+        migrations.AlterField(model_name=model_name, name=key, field=field),
+        migrations.AlterField(
+            model_name=model_name,
+            name='row_id',
+            field=models.BigAutoField(primary_key=True, serialize=False),
+        ),
+    ]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0006_dinebillmonth_date_index'),
+    ]
+
+    operations = [
+        # acc_users.id is the POS login id; Django reserves the field name
+        # `id` for primary keys, so the field becomes user_id. Its column is
+        # named back to `id` once row_id is the primary key (below): while
+        # acc_users has no primary key, Django's state adds an implicit `id`.
+        migrations.RenameField(model_name='accusers', old_name='id', new_name='user_id'),
+
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='row_id',
+                field=models.BigIntegerField(null=True),
+            )
+            for model_name, _ in PK_SWAPS
+        ],
+        migrations.RunPython(number_rows, migrations.RunPython.noop),
+
+        *swap_primary_key('accusers', 'user_id', models.CharField(max_length=30)),
+        *swap_primary_key('dinebill', 'billno', models.DecimalField(decimal_places=0, max_digits=10)),
+        *swap_primary_key('dinebillmonth', 'billno', models.DecimalField(decimal_places=0, max_digits=10)),
+        *swap_primary_key('dinekotsalesdetail', 'slno', models.DecimalField(decimal_places=0, max_digits=10)),
+        *swap_primary_key('cancelledbills', 'billno', models.DecimalField(decimal_places=0, max_digits=10)),
+        migrations.RunPython(reset_row_id_sequences, migrations.RunPython.noop),
+        # keep the column name other readers of acc_users know
+        migrations.AlterField(
+            model_name='accusers',
+            name='user_id',
+            field=models.CharField(db_column='id', max_length=30),
+        ),
+
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='outlet',
+                field=models.CharField(default='default', max_length=30),
+            )
+            for model_name in (
+                'accusers', 'tbitemmaster', 'dinebill', 'dinebillmonth',
+                'dinekotsalesdetail', 'cancelledbills', 'syncstate',
+            )
+        ],
+
+        migrations.AlterField(
+            model_name='tbitemmaster',
+            name='item_code',
+            field=models.CharField(max_length=15),
+        ),
+        migrations.AlterField(
+            model_name='syncstate',
+            name='table_name',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='dinebill',
+            name='date_field',
+            field=models.DateField(blank=True, db_column='date', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dinebill',
+            index=models.Index(fields=['outlet', 'date_field'], name='dine_bill_outlet_date'),
+        ),
+        migrations.AlterField(
+            model_name='dinebillmonth',
+            name='date_field',
+            field=models.DateField(blank=True, db_column='date', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dinebillmonth',
+            index=models.Index(fields=['outlet', 'date_field'], name='dine_bill_month_outlet_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='accusers',
+            constraint=models.UniqueConstraint(fields=('outlet', 'user_id'), name='acc_users_outlet_user_id_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='tbitemmaster',
+            constraint=models.UniqueConstraint(fields=('outlet', 'item_code'), name='tb_item_master_outlet_item_code_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dinebill',
+            constraint=models.UniqueConstraint(fields=('outlet', 'billno'), name='dine_bill_outlet_billno_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dinebillmonth',
+            constraint=models.UniqueConstraint(fields=('outlet', 'billno'), name='dine_bill_month_outlet_billno_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='dinekotsalesdetail',
+            constraint=models.UniqueConstraint(fields=('outlet', 'slno'), name='dine_kot_sales_detail_outlet_slno_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='cancelledbills',
+            constraint=models.UniqueConstraint(fields=('outlet', 'billno'), name='cancelled_bills_outlet_billno_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='syncstate',
+            constraint=models.UniqueConstraint(fields=('outlet', 'table_name'), name='sync_state_outlet_table_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0007_outlets'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dinekotsalesdetail',
+            index=models.Index(fields=['outlet', 'billno'], name='dine_kot_outlet_billno'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:23
+
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.db import migrations, models
+
+
+def hash_passwords(apps, schema_editor):
+    AccUsers = apps.get_model('app1', 'AccUsers')
+    db = schema_editor.connection.alias
+    hasher = get_hasher(settings.ACC_USERS_PASSWORD_HASHER)
+    iterations = getattr(settings, 'ACC_USERS_PASSWORD_ITERATIONS', None)
+    users = list(AccUsers.objects.using(db).only('pass_field'))
+    for user in users:
+        if iterations and hasattr(hasher, 'iterations'):
+            user.pass_hash = hasher.encode(user.pass_field, hasher.salt(), iterations)
+        else:
+            user.pass_hash = make_password(user.pass_field, hasher=hasher)
+    AccUsers.objects.using(db).bulk_update(users, ['pass_hash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0008_kot_billno_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accusers',
+            name='pass_hash',
+            field=models.CharField(blank=True, default='', max_length=128),
+        ),
+        migrations.RunPython(hash_passwords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:38
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def mark_cancelled(apps, schema_editor):
+    CancelledBills = apps.get_model('app1', 'CancelledBills')
+    db = schema_editor.connection.alias
+    for model_name in ('DineBill', 'DineBillMonth'):
+        model = apps.get_model('app1', model_name)
+        cancelled = CancelledBills.objects.using(db).filter(outlet=OuterRef('outlet'), billno=OuterRef('billno'))
+        model.objects.using(db).filter(Exists(cancelled)).update(is_cancelled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0009_accusers_pass_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dinebill',
+            name='is_cancelled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='dinebillmonth',
+            name='is_cancelled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='dinebill',
+            index=models.Index(fields=['outlet', 'is_cancelled', 'date_field'], name='dine_bill_outlet_cancelled'),
+        ),
+        migrations.AddIndex(
+            model_name='dinebillmonth',
+            index=models.Index(fields=['outlet', 'is_cancelled', 'date_field'], name='dine_bill_month_cancelled'),
+        ),
+        migrations.RunPython(mark_cancelled, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:51
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+
+def mark_cancelled(apps, schema_editor):
+    CancelledBills = apps.get_model('app1', 'CancelledBills')
+    DineKotSalesDetail = apps.get_model('app1', 'DineKotSalesDetail')
+    db = schema_editor.connection.alias
+    cancelled = CancelledBills.objects.using(db).filter(outlet=OuterRef('outlet'), billno=OuterRef('billno'))
+    DineKotSalesDetail.objects.using(db).filter(Exists(cancelled)).update(is_cancelled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app1', '0010_bill_is_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dinekotsalesdetail',
+            name='is_cancelled',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='dinekotsalesdetail',
+            index=models.Index(fields=['outlet', 'is_cancelled'], name='dine_kot_outlet_cancelled'),
+        ),
+        migrations.RunPython(mark_cancelled, migrations.RunPython.noop),
+    ]
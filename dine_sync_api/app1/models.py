@@ -1,20 +1,32 @@
 
 from django.db import models
 
+# Every synced row belongs to an outlet (one restaurant). Clients that do
+# not name one keep working against this outlet.
+DEFAULT_OUTLET = 'default'
+
+
 class AccUsers(models.Model):
-    id = models.CharField(max_length=30, primary_key=True)
+    row_id = models.BigAutoField(primary_key=True)
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    user_id = models.CharField(max_length=30, db_column='id')  # the POS login id, sent as 'id'
     pass_field = models.CharField(max_length=100, db_column='pass')  # 'pass' is a reserved word in Python
+    pass_hash = models.CharField(max_length=128, blank=True, default='')  # salted hash of pass, set at sync time
     
     class Meta:
         db_table = 'acc_users'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'user_id'], name='acc_users_outlet_user_id_uniq'),
+        ]
         
     def __str__(self):
-        return self.id
+        return self.user_id
 
 
 class TbItemMaster(models.Model):
     id = models.AutoField(primary_key=True)               # new PK
-    item_code = models.CharField(max_length=15, unique=True)
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    item_code = models.CharField(max_length=15)
     item_name = models.CharField(max_length=60, blank=True, null=True)
     rate = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
     rate1 = models.DecimalField(max_digits=8, decimal_places=2, blank=True, null=True)
@@ -29,6 +41,9 @@ class TbItemMaster(models.Model):
 
     class Meta:
         db_table = 'tb_item_master'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'item_code'], name='tb_item_master_outlet_item_code_uniq'),
+        ]
 
     def __str__(self):
         return self.item_code        
@@ -41,27 +56,51 @@ class TbItemMaster(models.Model):
 
 
 class DineBill(models.Model):
-    billno = models.DecimalField(max_digits=10, decimal_places=0, primary_key=True)
+    row_id = models.BigAutoField(primary_key=True)
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    billno = models.DecimalField(max_digits=10, decimal_places=0)
     time_field = models.DateTimeField(blank=True, null=True, db_column='time')  # 'time' is reserved
     user_field = models.CharField(max_length=15, blank=True, null=True, db_column='user')  # 'user' is reserved
     amount = models.DecimalField(max_digits=13, decimal_places=5, blank=True, null=True)
     date_field = models.DateField(blank=True, null=True, db_column='date')  # 'date' is reserved - ADDED
+    is_cancelled = models.BooleanField(default=False)  # billno is in cancelled_bills, kept in step at sync time
 
     class Meta:
         db_table = 'dine_bill'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'billno'], name='dine_bill_outlet_billno_uniq'),
+        ]
+        indexes = [
+            # ?from_date=/?to_date= reads and exports
+            models.Index(fields=['outlet', 'date_field'], name='dine_bill_outlet_date'),
+            # ?exclude_cancelled=1 reads, optionally by date
+            models.Index(fields=['outlet', 'is_cancelled', 'date_field'], name='dine_bill_outlet_cancelled'),
+        ]
         
     def __str__(self):
         return str(self.billno)
     
 class DineBillMonth(models.Model):
-    billno = models.DecimalField(max_digits=10, decimal_places=0, primary_key=True)
+    row_id = models.BigAutoField(primary_key=True)
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    billno = models.DecimalField(max_digits=10, decimal_places=0)
     time_field = models.DateTimeField(blank=True, null=True, db_column='time')  # 'time' is reserved
     user_field = models.CharField(max_length=15, blank=True, null=True, db_column='user')  # 'user' is reserved
     amount = models.DecimalField(max_digits=13, decimal_places=5, blank=True, null=True)
     date_field = models.DateField(blank=True, null=True, db_column='date')  # 'date' is reserved
+    is_cancelled = models.BooleanField(default=False)  # billno is in cancelled_bills, kept in step at sync time
 
     class Meta:
         db_table = 'dine_bill_month'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'billno'], name='dine_bill_month_outlet_billno_uniq'),
+        ]
+        indexes = [
+            # history syncs replace a date span within an outlet
+            models.Index(fields=['outlet', 'date_field'], name='dine_bill_month_outlet_date'),
+            # ?exclude_cancelled=1 reads, optionally by date
+            models.Index(fields=['outlet', 'is_cancelled', 'date_field'], name='dine_bill_month_cancelled'),
+        ]
         
     def __str__(self):
         return f"Monthly Bill {self.billno}"
@@ -70,14 +109,26 @@ class DineBillMonth(models.Model):
 
 
 class DineKotSalesDetail(models.Model):
-    slno = models.DecimalField(max_digits=10, decimal_places=0, primary_key=True)
+    row_id = models.BigAutoField(primary_key=True)
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    slno = models.DecimalField(max_digits=10, decimal_places=0)
     billno = models.DecimalField(max_digits=10, decimal_places=0, blank=True, null=True)
     item = models.CharField(max_length=15, blank=True, null=True)
     qty = models.DecimalField(max_digits=10, decimal_places=3, blank=True, null=True)
     rate = models.DecimalField(max_digits=14, decimal_places=5, blank=True, null=True)
+    is_cancelled = models.BooleanField(default=False)  # billno is in cancelled_bills, kept in step at sync time
 
     class Meta:
         db_table = 'dine_kot_sales_detail'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'slno'], name='dine_kot_sales_detail_outlet_slno_uniq'),
+        ]
+        indexes = [
+            # bill detail looks lines up by bill
+            models.Index(fields=['outlet', 'billno'], name='dine_kot_outlet_billno'),
+            # ?exclude_cancelled=1 exports
+            models.Index(fields=['outlet', 'is_cancelled'], name='dine_kot_outlet_cancelled'),
+        ]
         
     def __str__(self):
         return f"KOT {self.slno} - Bill {self.billno}"
@@ -89,13 +140,38 @@ class DineKotSalesDetail(models.Model):
 # takes from dine_bill db
 
 class CancelledBills(models.Model): 
-    billno = models.DecimalField(max_digits=10, decimal_places=0, primary_key=True)
+    row_id = models.BigAutoField(primary_key=True)
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    billno = models.DecimalField(max_digits=10, decimal_places=0)
     date_field = models.DateField(blank=True, null=True, db_column='date')  # 'date' is reserved
     creditcard = models.CharField(max_length=30, blank=True, null=True)
     colnstatus = models.CharField(max_length=1, blank=True, null=True)
 
     class Meta:
         db_table = 'cancelled_bills'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'billno'], name='cancelled_bills_outlet_billno_uniq'),
+        ]
         
     def __str__(self):
-        return f"Cancelled Bill {self.billno}"
\ No newline at end of file
+        return f"Cancelled Bill {self.billno}"
+
+
+class SyncState(models.Model):
+    """Bookkeeping for the last committed sync of each table, per outlet"""
+    outlet = models.CharField(max_length=30, default=DEFAULT_OUTLET)
+    table_name = models.CharField(max_length=64)
+    generation = models.PositiveBigIntegerField(default=0)  # bumped on every committed sync
+    fingerprint = models.CharField(max_length=64, blank=True, default='')  # sha256 of the request body
+    idempotency_key = models.CharField(max_length=255, blank=True, null=True)
+    result = models.JSONField(blank=True, null=True)  # response body, replayed for identical retries
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'sync_state'
+        constraints = [
+            models.UniqueConstraint(fields=['outlet', 'table_name'], name='sync_state_outlet_table_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.outlet}/{self.table_name} @ {self.generation}"
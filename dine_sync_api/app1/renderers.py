@@ -0,0 +1,34 @@
+"""
+Faster JSON rendering for the read endpoints.
+
+FastJSONRenderer renders with orjson when it is installed, falling back to
+DRF's JSONRenderer otherwise (and for ?indent / browsable requests).
+Decimals are never turned into floats: the serializers already render
+them as strings, and any Decimal left in the data is written in fixed-point
+notation (format(d, 'f')), never as str()'s exponent form like '1E+2'.
+"""
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # stdlib json through DRF
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal):
+        return format(obj, 'f')
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(data, default=_default, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS)
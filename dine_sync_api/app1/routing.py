@@ -0,0 +1,106 @@
+"""
+Read replica routing.
+
+GET requests to views that set `read_replica = True` read from one of the
+READ_REPLICAS database aliases; everything else, and every write, uses
+the primary ('default'):
+
+- sync POSTs always run on the primary;
+- after a sync commits, the outlet's reads stay on the primary for
+  READ_REPLICA_PIN_SECONDS, so clients read their own writes while the
+  replicas catch up;
+- replicas are health-checked (SELECT 1) at most every
+  READ_REPLICA_HEALTH_SECONDS per worker, and reads fall back to the
+  primary while none is healthy.
+
+With no READ_REPLICAS configured the middleware does nothing.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from .tenancy import request_outlet
+
+logger = logging.getLogger(__name__)
+
+# database alias the current request reads from, None for the primary
+read_alias = contextvars.ContextVar('read_alias', default=None)
+
+_health = {}  # alias -> (healthy, checked at)
+
+
+def pin_key(outlet):
+    return f'replica_pin:{outlet}'
+
+
+def pin_to_primary(outlet):
+    """Keep the outlet's reads on the primary for READ_REPLICA_PIN_SECONDS (call after a commit)."""
+    if settings.READ_REPLICAS:
+        cache.set(pin_key(outlet), True, settings.READ_REPLICA_PIN_SECONDS)
+
+
+def replica_healthy(alias):
+    healthy, checked_at = _health.get(alias, (None, 0.0))
+    now = time.monotonic()
+    if healthy is None or now - checked_at >= settings.READ_REPLICA_HEALTH_SECONDS:
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT 1')
+            healthy = True
+        except DatabaseError as e:
+            if healthy is not False:
+                logger.warning(f"Read replica {alias} is unavailable, reading from the primary: {str(e)}")
+            connections[alias].close()
+            healthy = False
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def choose_replica():
+    """A healthy replica alias, or None when reads should go to the primary"""
+    healthy = [alias for alias in settings.READ_REPLICAS if replica_healthy(alias)]
+    return random.choice(healthy) if healthy else None
+
+
+class ReadReplicaMiddleware:
+    """Decides per request whether its reads may go to a replica."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        read_alias.set(None)
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not settings.READ_REPLICAS or request.method not in ('GET', 'HEAD'):
+            return None
+        view_class = getattr(view_func, 'view_class', None)
+        if not getattr(view_class, 'read_replica', False):
+            return None
+        try:
+            outlet = request_outlet(request)
+        except Exception:
+            return None  # the view reports the bad outlet
+        if cache.get(pin_key(outlet)):
+            return None
+        read_alias.set(choose_replica())
+        return None
+
+
+class ReadReplicaRouter:
+    """Sends reads to the replica chosen for the request, writes to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -1,7 +1,11 @@
+from decimal import Decimal
+
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from .models import AccUsers, TbItemMaster, DineBill,DineKotSalesDetail,DineBillMonth
 
 class AccUsersSerializer(serializers.ModelSerializer):
+    id = serializers.CharField(source='user_id', max_length=30)
     password = serializers.CharField(source='pass_field', max_length=100)
     
     class Meta:
@@ -12,7 +16,7 @@ class AccUsersSerializer(serializers.ModelSerializer):
         return AccUsers.objects.create(**validated_data)
     
     def update(self, instance, validated_data):
-        instance.id = validated_data.get('id', instance.id)
+        instance.user_id = validated_data.get('user_id', instance.user_id)
         instance.pass_field = validated_data.get('pass_field', instance.pass_field)
         instance.save()
         return instance
@@ -105,4 +109,54 @@ class CancelledBillsSerializer(serializers.ModelSerializer):
         try:
             return int(float(str(value)))
         except (ValueError, TypeError):
-            raise serializers.ValidationError("Invalid billno format")
\ No newline at end of file
+            raise serializers.ValidationError("Invalid billno format")
+
+def is_plain_decimal(field):
+    """A DecimalField rendered as a fixed-point string with its decimal places, nothing else"""
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    return coerce_to_string and field.decimal_places is not None and not (field.localize or field.normalize_output)
+
+
+def row_serializer(serializer_class):
+    """
+    (sources, to_row) for reading `serializer_class`'s representation straight
+    from `.values_list(*sources)` tuples, bypassing per-field to_representation.
+
+    Decimals become the same fixed-point strings DecimalField renders;
+    datetimes go through the field once each (timezone and 'Z' handling);
+    dates and strings are passed through for the renderer.
+    """
+    fields = list(serializer_class().fields.values())
+    names = [field.field_name for field in fields]
+    model_fields = {f.name: f for f in serializer_class.Meta.model._meta.concrete_fields}
+    converters = []
+    for field in fields:
+        if isinstance(field, serializers.DecimalField) and is_plain_decimal(field):
+            column = model_fields.get(field.source)
+            if getattr(column, 'decimal_places', None) == field.decimal_places:
+                # the database already returns the column's scale
+                converters.append(lambda value: format(value, 'f'))
+            else:
+                quantum = Decimal(1).scaleb(-field.decimal_places)
+                converters.append(lambda value, quantum=quantum: format(value.quantize(quantum), 'f'))
+        elif isinstance(field, (serializers.DecimalField, serializers.DateTimeField)):
+            converters.append(field.to_representation)
+        else:
+            converters.append(None)
+    converted = [(i, convert) for i, convert in enumerate(converters) if convert is not None]
+
+    def to_row(values):
+        if converted:
+            values = list(values)
+            for i, convert in converted:
+                if values[i] is not None:
+                    values[i] = convert(values[i])
+        return dict(zip(names, values))
+
+    return [field.source for field in fields], to_row
+
+
+def serialize_rows(queryset, serializer_class):
+    """What serializer_class(queryset, many=True).data returns, built from .values_list() tuples"""
+    sources, to_row = row_serializer(serializer_class)
+    return [to_row(values) for values in queryset.values_list(*sources)]
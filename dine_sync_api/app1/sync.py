@@ -0,0 +1,443 @@
+"""
+Shared helpers for the table sync (POST) endpoints.
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+
+from . import events
+from .models import SyncState
+from .routing import pin_to_primary
+
+NON_FIELD = 'non_field_errors'
+
+
+class SyncAborted(Exception):
+    """Raised inside the sync transaction to roll it back once too many rows failed."""
+
+    def __init__(self, errors, message=None):
+        self.errors = errors
+        super().__init__(message or f'Aborted after {errors.failed} invalid rows')
+
+
+class SyncErrors:
+    """
+    Collects row errors for one sync without keeping the rows themselves.
+
+    Errors are grouped by (field, message); each group keeps a count and
+    the first few row indices. Only `max_groups` groups are reported, but
+    every failure is still counted. With `max_errors` set, `add()` raises
+    SyncAborted as soon as more than that many rows have failed.
+    """
+
+    def __init__(self, max_groups=None, max_indices=None, max_errors=None):
+        self.max_groups = max_groups if max_groups is not None else settings.SYNC_ERROR_MAX_GROUPS
+        self.max_indices = max_indices if max_indices is not None else settings.SYNC_ERROR_MAX_INDICES
+        self.max_errors = max_errors
+        self.failed = 0
+        self.truncated = False
+        self._groups = {}
+
+    def __bool__(self):
+        return self.failed > 0
+
+    def __len__(self):
+        return self.failed
+
+    def add(self, index, error, field=NON_FIELD):
+        """Record that row `index` failed; `error` is serializer.errors or a message."""
+        self.failed += 1
+        for group_field, message in self._flatten(error, field):
+            key = (group_field, message)
+            group = self._groups.get(key)
+            if group is None:
+                if len(self._groups) >= self.max_groups:
+                    self.truncated = True
+                    continue
+                group = self._groups[key] = {'field': group_field, 'error': message, 'rows': 0, 'first_indices': []}
+            group['rows'] += 1
+            if len(group['first_indices']) < self.max_indices:
+                group['first_indices'].append(index)
+
+        if self.max_errors is not None and self.failed > self.max_errors:
+            raise SyncAborted(self)
+
+    def _flatten(self, error, field):
+        if isinstance(error, dict):
+            for key, value in error.items():
+                yield from self._flatten(value, key)
+        elif isinstance(error, (list, tuple)):
+            for value in error:
+                yield from self._flatten(value, field)
+        else:
+            yield field, str(error)
+
+    def as_list(self):
+        return [
+            dict(group, message=f"field `{group['field']}`: {group['error']} ({group['rows']} rows)")
+            for group in self._groups.values()
+        ]
+
+    def summary(self):
+        """Keys merged into the sync response."""
+        return {
+            'failed': self.failed,
+            'errors': self.as_list(),
+            'errors_truncated': self.truncated,
+        }
+
+
+def sync_errors_for(request):
+    """
+    Build a SyncErrors for a sync request.
+
+    `?max_errors=N` turns on fail-fast: the sync is rolled back once more
+    than N rows are invalid. SYNC_MAX_ERRORS sets the default.
+    """
+    max_errors = request.query_params.get('max_errors', settings.SYNC_MAX_ERRORS)
+    if max_errors in (None, ''):
+        return SyncErrors()
+    try:
+        max_errors = int(max_errors)
+    except (TypeError, ValueError):
+        raise ParseError('max_errors must be an integer')
+    return SyncErrors(max_errors=max(max_errors, 0))
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Idempotency-Key was already used for a different payload'
+    default_code = 'idempotency_conflict'
+
+
+def payload_fingerprint(request):
+    """
+    sha256 of the raw request body.
+
+    Must be called before request.data so Django keeps the body around.
+    """
+    return hashlib.sha256(request.body).hexdigest()
+
+
+def replayable_result(outlet, table_name, fingerprint, idempotency_key=None):
+    """
+    Stored result of the outlet's last committed sync of the table if this request repeats it.
+
+    Returns None when the payload differs. Reusing the last sync's
+    Idempotency-Key with a different payload raises IdempotencyConflict.
+    """
+    state = SyncState.objects.filter(outlet=outlet, table_name=table_name).only(
+        'fingerprint', 'idempotency_key', 'result'
+    ).first()
+    if state is None or state.result is None:
+        return None
+    if state.fingerprint == fingerprint:
+        return state.result
+    if idempotency_key and idempotency_key == state.idempotency_key:
+        raise IdempotencyConflict()
+    return None
+
+
+def lock_sync_state(outlet, table_name):
+    """
+    Lock the outlet's SyncState row for the table for the rest of the transaction.
+
+    Taken at the start of a sync so two syncs of the same outlet and table
+    run one after the other instead of diffing against the same snapshot.
+    Other outlets sync the same table concurrently.
+    """
+    state, _ = SyncState.objects.select_for_update().get_or_create(outlet=outlet, table_name=table_name)
+    return state
+
+
+def record_sync(state, fingerprint, idempotency_key, result):
+    """
+    Remember a sync, bump the table's generation and announce it to
+    /api/events/ listeners; the outlet's reads stay on the primary for a
+    while after it commits.
+
+    Call inside the sync transaction, with the state from lock_sync_state(),
+    so the bookkeeping commits (or rolls back) together with the rows.
+    Returns the new generation.
+    """
+    state.generation += 1
+    state.fingerprint = fingerprint
+    state.idempotency_key = idempotency_key
+    state.result = result
+    state.save()
+
+    generation = state.generation
+
+    def published():
+        cache.set(generation_key(state.outlet, state.table_name), generation, None)
+        pin_to_primary(state.outlet)
+
+    transaction.on_commit(published)
+    events.publish(state.outlet, state.table_name, generation, result)
+    return generation
+
+
+def generation_key(outlet, table_name):
+    return f'sync_generation:{outlet}:{table_name}'
+
+
+def current_generation(outlet, table_name):
+    """
+    The outlet's committed sync generation for a table (0 before the first sync).
+
+    Read from the shared cache, which every committed sync updates, so
+    callers can tell whether anything they derived from the table is stale
+    without a database round trip. Falls back to sync_state on the primary
+    when the cache was cleared.
+    """
+    key = generation_key(outlet, table_name)
+    generation = cache.get(key)
+    if generation is None:
+        generation = SyncState.objects.using(DEFAULT_DB_ALIAS).filter(outlet=outlet, table_name=table_name).values_list(
+            'generation', flat=True
+        ).first() or 0
+        cache.add(key, generation, None)
+    return generation
+
+
+# ---------------------------------------------------------------------------
+# Row diffing: a full-table POST is turned into inserts/updates/deletes
+# ---------------------------------------------------------------------------
+
+def sync_validator(serializer_class):
+    """
+    One serializer instance to validate every row of a sync.
+
+    Uniqueness validators are dropped: the payload replaces the table, so
+    a key that already exists is an update, not an error (and checking it
+    would cost a query per row). Duplicates inside the payload are caught
+    by validate_rows().
+    """
+    from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
+
+    serializer = serializer_class()
+    for field in serializer.fields.values():
+        field.validators = [v for v in field.validators if not isinstance(v, UniqueValidator)]
+    serializer.validators = [v for v in serializer.validators if not isinstance(v, UniqueTogetherValidator)]
+    return serializer
+
+
+def row_key(field, value):
+    """Canonical string form of a key value, so 5, '5' and Decimal('5') match."""
+    value = field.to_python(value)
+    if isinstance(value, Decimal):
+        return format(value.quantize(Decimal(1).scaleb(-field.decimal_places)), 'f')
+    return str(value)
+
+
+def validate_rows(serializer, data, key_field, errors, required_field=None):
+    """
+    Validate a sync payload row by row.
+
+    Returns {key: validated_data} in payload order; invalid and duplicate
+    rows are recorded on `errors` (which may raise SyncAborted).
+    """
+    from rest_framework.exceptions import ValidationError
+
+    field = serializer.Meta.model._meta.get_field(key_field)
+    rows = {}
+    for index, record in enumerate(data):
+        if not isinstance(record, dict):
+            errors.add(index, 'Expected an object')
+            continue
+        if required_field and not record.get(required_field):
+            errors.add(index, f'{required_field} is required', field=required_field)
+            continue
+        try:
+            validated = serializer.run_validation(record)
+        except ValidationError as e:
+            errors.add(index, e.detail)
+            continue
+        if validated.get(field.attname) is None:
+            errors.add(index, 'This field is required.', field=key_field)
+            continue
+        key = row_key(field, validated[field.attname])
+        if key in rows:
+            errors.add(index, 'Duplicate key in payload', field=key_field)
+            continue
+        rows[key] = validated
+    return rows
+
+
+class RowCanon:
+    """
+    Turns a row into a comparable digest.
+
+    Values coming from the serializer and from the database differ in type
+    (int vs Decimal, '12.5' vs Decimal('12.50000'), naive vs aware
+    datetimes), so each value is brought to the model field's canonical
+    form before hashing.
+    """
+
+    def __init__(self, model, fields):
+        self.fields = [model._meta.get_field(name) for name in fields]
+        self.defaults = [f.get_default() for f in self.fields]
+        self._quantums = [
+            Decimal(1).scaleb(-f.decimal_places) if isinstance(f, models.DecimalField) else None
+            for f in self.fields
+        ]
+
+    def values(self, row):
+        """Field values for a validated-data dict (missing keys take the field default)."""
+        return [row.get(f.attname, default) for f, default in zip(self.fields, self.defaults)]
+
+    def digest(self, values):
+        canon = []
+        for field, quantum, value in zip(self.fields, self._quantums, values):
+            if value is None:
+                canon.append(None)
+                continue
+            value = field.to_python(value)
+            if quantum is not None:
+                value = value.quantize(quantum)
+            elif isinstance(value, datetime):
+                if timezone.is_naive(value):  # stored as TIME_ZONE, as Django would save it
+                    value = timezone.make_aware(value)
+                value = value.astimezone(dt_timezone.utc)
+            canon.append(str(value))
+        return hashlib.blake2b(repr(canon).encode(), digest_size=16).digest()
+
+
+def sync_fields(model):
+    """Concrete fields a sync writes: everything except an auto-increment surrogate key."""
+    return [
+        f.attname for f in model._meta.concrete_fields
+        if not isinstance(f, models.AutoField)
+    ]
+
+
+class TableDiff:
+    """What a full-table payload changes in the rows it replaces."""
+
+    def __init__(self, model):
+        self.model = model
+        self.inserts = []    # validated rows
+        self.updates = []    # (pk, validated row)
+        self.deletes = []    # pks
+        self.unchanged = 0
+        self.existing = 0
+
+    def summary(self):
+        return {
+            'inserted': len(self.inserts),
+            'updated': len(self.updates),
+            'deleted': len(self.deletes),
+            'unchanged': self.unchanged,
+        }
+
+
+def diff_rows(queryset, key_field, rows, outside=None):
+    """
+    Compare validated payload rows with what `queryset` currently holds.
+
+    Existing rows are streamed as (pk, key, *fields) and only a 16-byte
+    digest per row is kept in memory, keyed by `key_field`.
+
+    When a sync only replaces part of the table, `outside` is the rest of
+    it: payload keys that already live there become updates (the row moves
+    into the synced scope) instead of inserts that would collide.
+    """
+    model = queryset.model
+    fields = sync_fields(model)
+    canon = RowCanon(model, fields)
+    key = model._meta.get_field(key_field)
+
+    current = {}
+    values = queryset.values_list(model._meta.pk.attname, key.attname, *fields)
+    for pk, key_value, *row in values.iterator(chunk_size=5000):
+        current[row_key(key, key_value)] = (pk, canon.digest(row))
+
+    diff = TableDiff(model)
+    diff.existing = len(current)
+    new_keys = []
+    for row_id, row in rows.items():
+        found = current.pop(row_id, None)
+        if found is None:
+            new_keys.append(row_id)
+        elif found[1] == canon.digest(canon.values(row)):
+            diff.unchanged += 1
+        else:
+            diff.updates.append((found[0], row))
+    diff.deletes = [pk for pk, _ in current.values()]
+
+    moved = {}
+    if outside is not None and new_keys:
+        batch_size = settings.SYNC_BATCH_SIZE
+        for start in range(0, len(new_keys), batch_size):
+            batch = [rows[k][key.attname] for k in new_keys[start:start + batch_size]]
+            lookup = {f'{key.attname}__in': batch}
+            for pk, key_value in outside.filter(**lookup).values_list(model._meta.pk.attname, key.attname):
+                moved[row_key(key, key_value)] = pk
+    for row_id in new_keys:
+        if row_id in moved:
+            diff.updates.append((moved[row_id], rows[row_id]))
+        else:
+            diff.inserts.append(rows[row_id])
+    return diff
+
+
+def date_span_scope(field_name, dates):
+    """
+    Q matching the date span the given dates cover, [earliest, latest].
+
+    A history sync replaces the span of its payload and leaves every row
+    dated before or after it alone, so a POS sending a rolling window never
+    deletes older history. Rows with no date are one more scope of their
+    own, replaced only when the payload has undated rows. Returns the Q
+    (None for an empty payload) and a description of the span.
+    """
+    earliest = latest = None
+    undated = False
+    for value in dates:
+        if value is None:
+            undated = True
+        else:
+            earliest = value if earliest is None else min(earliest, value)
+            latest = value if latest is None else max(latest, value)
+
+    scope = None
+    span = {
+        'from_date': earliest.isoformat() if earliest else None,
+        'to_date': latest.isoformat() if latest else None,
+        'undated': undated,
+    }
+    if earliest is not None:
+        scope = Q(**{f'{field_name}__gte': earliest, f'{field_name}__lte': latest})
+    if undated:
+        part = Q(**{f'{field_name}__isnull': True})
+        scope = part if scope is None else scope | part
+    return scope, span
+
+
+def apply_diff(diff, batch_size=None):
+    """
+    Write a TableDiff.
+
+    Changed rows are deleted and re-inserted under their old primary key,
+    which is much cheaper than bulk_update's CASE WHEN statements.
+    """
+    model = diff.model
+    batch_size = batch_size or settings.SYNC_BATCH_SIZE
+    pk_name = model._meta.pk.attname
+
+    stale = diff.deletes + [pk for pk, _ in diff.updates]
+    for start in range(0, len(stale), batch_size):
+        model.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+
+    objs = [model(**dict(row, **{pk_name: pk})) for pk, row in diff.updates]
+    objs += [model(**row) for row in diff.inserts]
+    if objs:
+        model.objects.bulk_create(objs, batch_size=batch_size)
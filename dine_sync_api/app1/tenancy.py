@@ -0,0 +1,29 @@
+"""
+Which outlet (restaurant) a request is for.
+
+POS clients name their outlet with the X-Outlet header (or ?outlet=);
+requests that do not name one use DEFAULT_OUTLET, so single-outlet
+deployments keep working unchanged.
+"""
+import re
+
+from rest_framework.exceptions import ParseError
+
+from .models import DEFAULT_OUTLET
+
+OUTLET_RE = re.compile(r'^[A-Za-z0-9_.-]{1,30}$')
+
+
+def request_outlet(request):
+    outlet = request.headers.get('X-Outlet') or request.GET.get('outlet') or DEFAULT_OUTLET
+    if not OUTLET_RE.match(outlet):
+        raise ParseError('outlet must be 1-30 letters, digits, dots, dashes or underscores')
+    return outlet
+
+
+class OutletMixin:
+    """Resolves the request's outlet into self.outlet before the handler runs."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.outlet = request_outlet(request)
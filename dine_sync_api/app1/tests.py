@@ -1,3 +1,782 @@
-from django.test import TestCase
+"""
+Tests for app1.
 
-# Create your tests here.
+The default settings point at the production database, so run them with
+the bench settings (SQLite unless BENCH_DB says otherwise):
+
+    DJANGO_SETTINGS_MODULE=dine_sync_api.settings_bench python manage.py test app1
+"""
+import csv
+import io
+import json
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from importlib.util import find_spec
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from . import credentials, item_cache, routing
+from .models import AccUsers, DineBill, DineBillMonth, DineKotSalesDetail, SyncState, TbItemMaster
+from .renderers import _default
+from .serializers import DineBillSerializer
+from .sync import (
+    RowCanon, SyncAborted, SyncErrors, apply_diff, date_span_scope, diff_rows, row_key, sync_validator,
+    validate_rows
+)
+from .throttling import parse_rate, take_token
+
+
+# For tests of what a view reads rather than where from: the test data is on
+# the primary, so keep reads there under BENCH_READ_REPLICA=separate too.
+primary_reads = override_settings(READ_REPLICAS=[])
+
+
+def validated(payload, serializer_class=DineBillSerializer, key_field='billno'):
+    """Payload rows as a sync sees them: validated and keyed"""
+    errors = SyncErrors()
+    rows = validate_rows(sync_validator(serializer_class), payload, key_field, errors)
+    return rows, errors
+
+
+class SyncErrorsTests(SimpleTestCase):
+    def test_groups_by_field_and_message(self):
+        errors = SyncErrors(max_groups=10, max_indices=2)
+        for index in range(5):
+            errors.add(index, {'amount': ['A valid number is required.']})
+        errors.add(5, 'Expected an object')
+        summary = errors.summary()
+        self.assertEqual(summary['failed'], 6)
+        self.assertEqual(
+            [(e['field'], e['rows'], e['first_indices']) for e in summary['errors']],
+            [('amount', 5, [0, 1]), ('non_field_errors', 1, [5])],
+        )
+        self.assertFalse(summary['errors_truncated'])
+
+    def test_groups_are_capped_but_every_failure_counted(self):
+        errors = SyncErrors(max_groups=2, max_indices=5)
+        for index in range(4):
+            errors.add(index, f'error {index}')
+        self.assertEqual(len(errors), 4)
+        self.assertEqual(len(errors.as_list()), 2)
+        self.assertTrue(errors.summary()['errors_truncated'])
+
+    def test_fail_fast_after_max_errors(self):
+        errors = SyncErrors(max_errors=2)
+        errors.add(0, 'bad')
+        errors.add(1, 'bad')
+        with self.assertRaises(SyncAborted) as raised:
+            errors.add(2, 'bad')
+        self.assertIs(raised.exception.errors, errors)
+        self.assertEqual(errors.failed, 3)
+
+    def test_max_errors_zero_aborts_on_first_failure(self):
+        with self.assertRaises(SyncAborted):
+            SyncErrors(max_errors=0).add(0, 'bad')
+
+    def test_validate_rows_records_duplicates_and_missing_keys(self):
+        rows, errors = validated([{'billno': 1}, {'billno': '1'}, {'amount': '5'}, 'x'])
+        self.assertEqual(list(rows), ['1'])
+        self.assertEqual(errors.failed, 3)
+
+
+class RowKeyTests(SimpleTestCase):
+    def test_decimal_key_forms_match(self):
+        field = DineBill._meta.get_field('billno')
+        keys = {row_key(field, value) for value in (5, '5', Decimal('5'), Decimal('5.0'), '5.00')}
+        self.assertEqual(keys, {'5'})
+
+    def test_distinct_keys_differ(self):
+        field = DineBill._meta.get_field('billno')
+        self.assertNotEqual(row_key(field, 5), row_key(field, 50))
+
+    def test_char_key_is_kept_as_is(self):
+        field = TbItemMaster._meta.get_field('item_code')
+        self.assertEqual(row_key(field, 'I001'), 'I001')
+        self.assertNotEqual(row_key(field, 'I001'), row_key(field, 'i001'))
+
+
+class RowCanonTests(SimpleTestCase):
+    def setUp(self):
+        self.canon = RowCanon(DineBill, ['amount', 'time_field', 'user_field'])
+
+    def digest(self, amount=None, time=None, user=None):
+        return self.canon.digest([amount, time, user])
+
+    def test_decimal_forms_match(self):
+        expected = self.digest(amount=Decimal('12.50000'))
+        for value in ('12.5', Decimal('12.5'), 12.5, '12.50'):
+            self.assertEqual(self.digest(amount=value), expected, value)
+        self.assertNotEqual(self.digest(amount='12.51'), expected)
+
+    def test_integer_and_decimal_match(self):
+        self.assertEqual(self.digest(amount=12), self.digest(amount=Decimal('12.00000')))
+
+    def test_aware_datetimes_compare_as_instants(self):
+        utc = datetime(2024, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+        ist = utc.astimezone(dt_timezone(timedelta(hours=5, minutes=30)))
+        self.assertEqual(self.digest(time=utc), self.digest(time=ist))
+        self.assertNotEqual(self.digest(time=utc), self.digest(time=utc + timedelta(seconds=1)))
+
+    def test_naive_datetime_is_read_in_the_default_time_zone(self):
+        # TIME_ZONE is UTC
+        aware = datetime(2024, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(self.digest(time=datetime(2024, 1, 1, 10, 0)), self.digest(time=aware))
+
+    def test_none_differs_from_empty_string(self):
+        self.assertNotEqual(self.digest(user=None), self.digest(user=''))
+
+    def test_missing_keys_take_the_field_default(self):
+        self.assertEqual(RowCanon(SyncState, ['generation', 'fingerprint']).values({}), [0, ''])
+
+
+class DiffRowsTests(TestCase):
+    def setUp(self):
+        self.bills = {
+            billno: DineBill.objects.create(billno=billno, amount=Decimal('10'), user_field='a')
+            for billno in (1, 2, 3)
+        }
+
+    def diff(self, payload):
+        rows, errors = validated(payload)
+        self.assertFalse(errors)
+        return diff_rows(DineBill.objects.all(), 'billno', rows)
+
+    def test_insert_update_delete_unchanged(self):
+        diff = self.diff([
+            {'billno': '1', 'amount': '10.00000', 'user': 'a'},  # same values, other forms
+            {'billno': 2, 'amount': '11', 'user': 'a'},          # changed
+            {'billno': 4, 'amount': '1'},                        # new
+        ])                                                       # 3 is gone
+        self.assertEqual(diff.summary(), {'inserted': 1, 'updated': 1, 'deleted': 1, 'unchanged': 1})
+        self.assertEqual(diff.deletes, [self.bills[3].pk])
+        self.assertEqual([pk for pk, _ in diff.updates], [self.bills[2].pk])
+        self.assertEqual([row['billno'] for row in diff.inserts], [4])
+
+    def test_identical_payload_changes_nothing(self):
+        diff = self.diff([{'billno': n, 'amount': '10', 'user': 'a'} for n in (1, 2, 3)])
+        self.assertEqual(diff.summary(), {'inserted': 0, 'updated': 0, 'deleted': 0, 'unchanged': 3})
+
+    def test_key_found_outside_the_scope_is_moved(self):
+        scope = DineBill.objects.filter(billno__in=[1, 2])
+        outside = DineBill.objects.exclude(billno__in=[1, 2])
+        rows, _ = validated([{'billno': 1, 'amount': '10', 'user': 'a'}, {'billno': 3, 'amount': '5'}])
+        diff = diff_rows(scope, 'billno', rows, outside=outside)
+        self.assertEqual(diff.summary(), {'inserted': 0, 'updated': 1, 'deleted': 1, 'unchanged': 1})
+        self.assertEqual([pk for pk, _ in diff.updates], [self.bills[3].pk])
+    def test_apply_diff_keeps_primary_keys_of_updated_rows(self):
+        diff = self.diff([
+            {'billno': 1, 'amount': '10', 'user': 'a'},
+            {'billno': 2, 'amount': '20', 'user': 'b'},
+            {'billno': 4, 'amount': '1'},
+        ])
+        apply_diff(diff, batch_size=1)
+        rows = {int(bill.billno): bill for bill in DineBill.objects.all()}
+        self.assertEqual(sorted(rows), [1, 2, 4])
+        self.assertEqual(rows[1].pk, self.bills[1].pk)
+        self.assertEqual(rows[2].pk, self.bills[2].pk)
+        self.assertEqual((rows[2].amount, rows[2].user_field), (Decimal('20'), 'b'))
+        self.assertNotIn(rows[4].pk, [bill.pk for bill in self.bills.values()])
+
+
+class SyncPayloadTests(TestCase):
+    def setUp(self):
+        DineBill.objects.create(billno=1)
+
+    def post(self, body):
+        return self.client.post('/api/bills/', body, content_type='application/json')
+
+    def test_body_must_be_a_list_or_an_object(self):
+        for body in ('"notalist"', '5', 'null'):
+            response = self.post(body)
+            self.assertEqual(response.status_code, 400, body)
+            self.assertEqual(response.json()['status'], 'error')
+        self.assertEqual(DineBill.objects.count(), 1)
+
+    def test_no_valid_row_keeps_the_table(self):
+        response = self.post(json.dumps(['x', {'amount': '1'}]))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['failed'], 2)
+        self.assertEqual(DineBill.objects.count(), 1)
+
+    def test_single_object_and_empty_list(self):
+        self.assertEqual(self.post(json.dumps({'billno': 2})).json()['deleted'], 1)
+        self.assertEqual(list(DineBill.objects.values_list('billno', flat=True)), [2])
+        self.assertEqual(self.post('[]').json()['deleted'], 1)  # an empty table is a valid sync
+        self.assertFalse(DineBill.objects.exists())
+
+
+class SyncReplayTests(TestCase):
+    body = json.dumps([{'billno': 1, 'amount': '10'}, {'billno': 2, 'amount': '20'}])
+
+    def post(self, body, **headers):
+        return self.client.post('/api/bills/', body, content_type='application/json', headers=headers)
+
+    def test_identical_retry_replays_the_stored_result(self):
+        first = self.post(self.body)
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', first)
+        DineBill.objects.filter(billno=2).delete()  # the retry must not write
+        generation = SyncState.objects.get(table_name='dine_bill').generation
+
+        retry = self.post(self.body)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(list(DineBill.objects.values_list('billno', flat=True)), [1])
+        self.assertEqual(SyncState.objects.get(table_name='dine_bill').generation, generation)
+
+    def test_changed_body_is_synced(self):
+        self.post(self.body)
+        response = self.post(json.dumps([{'billno': 1, 'amount': '11'}]))
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual((response.json()['updated'], response.json()['deleted']), (1, 1))
+
+    def test_idempotency_key_reused_for_another_body_is_rejected(self):
+        self.assertEqual(self.post(self.body, **{'Idempotency-Key': 'k1'}).status_code, 200)
+        response = self.post(json.dumps([{'billno': 3}]), **{'Idempotency-Key': 'k1'})
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.json(), {
+            'status': 'error', 'message': 'Idempotency-Key was already used for a different payload'
+        })
+        self.assertEqual(sorted(DineBill.objects.values_list('billno', flat=True)), [1, 2])
+        self.assertEqual(self.post(self.body, **{'Idempotency-Key': 'k1'})['Idempotent-Replayed'], 'true')
+
+
+@primary_reads
+class OutletTests(TestCase):
+    def setUp(self):
+        for outlet in ('o1', 'o2'):
+            for billno in (1, 2):
+                DineBill.objects.create(outlet=outlet, billno=billno, amount=Decimal(billno))
+
+    def rows(self, outlet):
+        return sorted(DineBill.objects.filter(outlet=outlet).values_list('billno', 'amount'))
+
+    def test_sync_replaces_only_the_calling_outlets_rows(self):
+        before = self.rows('o2')
+        response = self.client.post(
+            '/api/bills/', json.dumps([{'billno': 2, 'amount': '5'}, {'billno': 3}]),
+            content_type='application/json', headers={'X-Outlet': 'o1'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {k: response.json()[k] for k in ('outlet', 'inserted', 'updated', 'deleted')},
+            {'outlet': 'o1', 'inserted': 1, 'updated': 1, 'deleted': 1},
+        )
+        self.assertEqual(self.rows('o1'), [(2, Decimal(5)), (3, None)])
+        self.assertEqual(self.rows('o2'), before)
+
+    def test_get_returns_only_the_requested_outlet(self):
+        DineBill.objects.filter(outlet='o2', billno=2).delete()
+        for outlet, billnos in (('o1', [1, 2]), ('o2', [1])):
+            response = self.client.get('/api/bills/', headers={'X-Outlet': outlet})
+            self.assertEqual([int(row['billno']) for row in response.json()['data']], billnos)
+        self.assertEqual(self.client.get('/api/bills/?outlet=o2').json()['count'], 1)
+
+    def test_invalid_outlet_is_rejected(self):
+        self.assertEqual(self.client.get('/api/bills/', headers={'X-Outlet': 'o 1'}).status_code, 400)
+
+    def test_acc_users_login_id_keeps_its_column(self):
+        self.assertEqual(AccUsers._meta.get_field('user_id').column, 'id')
+
+
+@primary_reads
+class CancelledBillsTests(TestCase):
+    """Bills 1 and 2 in both bill tables with one KOT line each; bill 1 is cancelled"""
+
+    def setUp(self):
+        cache.clear()
+        for billno in (1, 2):
+            DineBill.objects.create(billno=billno, date_field=date(2024, 1, billno))
+            DineBillMonth.objects.create(billno=billno, date_field=date(2024, 1, billno))
+            DineKotSalesDetail.objects.create(slno=billno, billno=billno, item='I1', qty=Decimal(1))
+        self.cancel(1)
+
+    def cancel(self, *billnos):
+        with self.captureOnCommitCallbacks(execute=True):  # generations move once the sync commits
+            response = self.client.post(
+                '/api/cancelled_bills/', json.dumps([{'billno': b} for b in billnos]), content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def flagged(self):
+        return [
+            sorted(int(b) for b in model.objects.filter(is_cancelled=True).values_list('billno', flat=True))
+            for model in (DineBill, DineBillMonth, DineKotSalesDetail)
+        ]
+
+    def billnos(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return sorted(int(row['billno']) for row in response.json()['data'])
+
+    def test_sync_flags_and_unflags_bills_and_lines(self):
+        self.assertEqual(self.flagged(), [[1], [1], [1]])
+        self.assertEqual(self.cancel(2)['rows_flagged'], 6)  # bill 1's three rows unflagged, bill 2's flagged
+        self.assertEqual(self.flagged(), [[2], [2], [2]])
+        self.assertEqual(self.cancel()['rows_flagged'], 3)
+        self.assertEqual(self.flagged(), [[], [], []])
+
+    def test_rows_synced_after_the_cancellation_arrive_flagged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/bills/', json.dumps([{'billno': 1}, {'billno': 3}]), content_type='application/json')
+        self.assertEqual(list(DineBill.objects.filter(is_cancelled=True).values_list('billno', flat=True)), [1])
+
+    def test_exclude_cancelled_on_bill_lists(self):
+        for url in ('/api/bills/', '/api/bills_month/'):
+            self.assertEqual(self.billnos(url), [1, 2])
+            self.assertEqual(self.billnos(f'{url}?exclude_cancelled=1'), [2])
+            self.assertEqual(self.billnos(f'{url}?exclude_cancelled=1&from_date=2024-01-02'), [2])
+
+    def test_exclude_cancelled_on_bill_details(self):
+        bill = self.client.get('/api/bills/1/').json()['data']
+        self.assertTrue(bill['cancelled'])
+        self.assertEqual(int(bill['cancellation']['billno']), 1)
+        self.assertEqual(self.client.get('/api/bills/1/?exclude_cancelled=1').status_code, 404)
+
+        response = self.client.get('/api/bills/batch/?billnos=1,2&exclude_cancelled=1').json()
+        self.assertEqual([int(bill['billno']) for bill in response['data']], [2])
+        self.assertEqual(response['missing'], [1])
+
+    def test_exclude_cancelled_on_exports(self):
+        for table, key in (('dine_bill', 'billno'), ('dine_bill_month', 'billno'), ('dine_kot_sales_detail', 'slno')):
+            for query, expected in (('', ['1', '2']), ('?exclude_cancelled=1', ['2'])):
+                response = self.client.get(f'/api/export/{table}.csv{query}')
+                self.assertEqual(response.status_code, 200)
+                rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+                self.assertEqual([row[key] for row in rows], expected, f'{table}{query}')
+
+
+@primary_reads
+class BillDetailTests(TestCase):
+    """Bill 1 is current with two KOT lines, bill 2 only in the month history"""
+
+    def setUp(self):
+        cache.clear()
+        item_cache.clear()
+        TbItemMaster.objects.create(item_code='I1', item_name='Tea', kitchen='K1')
+        DineBill.objects.create(billno=1, amount=Decimal('30'))
+        DineBillMonth.objects.create(billno=2, amount=Decimal('5'))
+        DineKotSalesDetail.objects.create(slno=2, billno=1, item='I9', qty=Decimal(1))
+        DineKotSalesDetail.objects.create(slno=1, billno=1, item='I1', qty=Decimal(2))
+
+    def test_single_bill_with_its_lines(self):
+        response = self.client.get('/api/bills/1/')
+        self.assertEqual(response.status_code, 200)
+        bill = response.json()['data']
+        self.assertEqual((bill['source'], bill['cancelled'], bill['cancellation']), ('dine_bill', False, None))
+        self.assertEqual(
+            [(int(line['slno']), line['item_name'], line['kitchen']) for line in bill['lines']],
+            [(1, 'Tea', 'K1'), (2, None, None)],  # I9 is not in the item master
+        )
+        self.assertEqual(self.client.get('/api/bills/2/').json()['data']['source'], 'dine_bill_month')
+
+    def test_missing_bill_is_404(self):
+        self.assertEqual(self.client.get('/api/bills/3/').status_code, 404)
+        self.assertEqual(self.client.get('/api/bills/1/', headers={'X-Outlet': 'o2'}).status_code, 404)
+
+    def test_batch_keeps_the_requested_order_and_lists_missing_bills(self):
+        response = self.client.get('/api/bills/batch/?billnos=3,2,1,2,4')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['count'], 2)
+        self.assertEqual([int(bill['billno']) for bill in body['data']], [2, 1])
+        self.assertEqual(body['missing'], [3, 4])
+
+    def test_batch_with_only_missing_bills(self):
+        body = self.client.get('/api/bills/batch/?billnos=7,8').json()
+        self.assertEqual((body['count'], body['data'], body['missing']), (0, [], [7, 8]))
+
+    @override_settings(BILL_DETAIL_MAX_BATCH=2)
+    def test_batch_rejects_bad_billnos(self):
+        for query in ('', '?billnos=', '?billnos=1,x', '?billnos=1,2,3'):
+            self.assertEqual(self.client.get(f'/api/bills/batch/{query}').status_code, 400, query)
+        self.assertEqual(self.client.get('/api/bills/batch/?billnos=1,2,1').status_code, 200)  # duplicates count once
+
+
+class PriceListTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        item_cache.clear()
+        TbItemMaster.objects.create(item_code='I2', item_name='Coffee', rate=Decimal('20'), rate7=Decimal('27.5'), kitchen='K2')
+        TbItemMaster.objects.create(item_code='I1', item_name='Tea', rate=Decimal('10'), category='Hot', kitchen='K1')
+
+    def price_list(self, query=''):
+        response = self.client.get(f'/api/items/price_list/{query}')
+        self.assertEqual(response.status_code, 200, query)
+        return response.json()
+
+    def test_tiers(self):
+        body = self.price_list()
+        self.assertEqual(body['tier'], 'rate')
+        self.assertEqual([(r['item_code'], r['rate']) for r in body['data']], [('I1', '10.00'), ('I2', '20.00')])
+        body = self.price_list('?tier=7')
+        self.assertEqual(body['tier'], 'rate7')
+        self.assertEqual([r['rate'] for r in body['data']], [None, '27.50'])
+
+    def test_tier_out_of_bounds_is_rejected(self):
+        for tier in ('8', '-1', 'x', ''):
+            self.assertEqual(self.client.get(f'/api/items/price_list/?tier={tier}').status_code, 400, tier)
+
+    def test_category_and_kitchen_filters(self):
+        self.assertEqual([r['item_code'] for r in self.price_list('?category=Hot')['data']], ['I1'])
+        self.assertEqual([r['item_code'] for r in self.price_list('?kitchen=K2')['data']], ['I2'])
+        self.assertEqual(self.price_list('?category=Hot&kitchen=K2')['count'], 0)
+
+    def test_index_is_rebuilt_when_the_generation_moves(self):
+        generation = self.price_list()['generation']
+        TbItemMaster.objects.filter(item_code='I1').update(rate=Decimal('11'))
+        self.assertEqual(self.price_list()['data'][0]['rate'], '10.00')  # unsynced writes stay invisible
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/items/', json.dumps([{'item_code': 'I1', 'item_name': 'Tea', 'rate': '12'}]),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        body = self.price_list()
+        self.assertGreater(body['generation'], generation)
+        self.assertEqual([(r['item_code'], r['rate']) for r in body['data']], [('I1', '12.00')])
+
+
+class KitchenLoadTests(TestCase):
+    """Bill 1 was timed ten minutes ago, bill 2 two hours ago"""
+
+    def setUp(self):
+        cache.clear()
+        item_cache.clear()
+        self.recent = timezone.now() - timedelta(minutes=10)
+        self.earlier = self.recent - timedelta(minutes=110)
+        TbItemMaster.objects.create(item_code='I1', item_name='Tea', kitchen='K1')
+        TbItemMaster.objects.create(item_code='I2', item_name='Dosa', kitchen='K2')
+        DineBill.objects.create(billno=1, time_field=self.recent)
+        DineBill.objects.create(billno=2, time_field=self.earlier)
+        for slno, billno, item, qty in ((1, 1, 'I1', '2'), (2, 1, 'I2', '1'), (3, 1, 'I1', '1'), (4, 2, 'I1', '5')):
+            DineKotSalesDetail.objects.create(slno=slno, billno=billno, item=item, qty=Decimal(qty))
+
+    def load(self, params=None):
+        response = self.client.get('/api/kitchen_load/', params or {})
+        self.assertEqual(response.status_code, 200, params)
+        return {entry['kitchen']: entry for entry in response.json()['data']}
+
+    def test_default_window_is_the_last_hour(self):
+        load = self.load()
+        self.assertEqual({k: entry['total_qty'] for k, entry in load.items()}, {'K1': '3.000', 'K2': '1.000'})
+        self.assertEqual(load['K1']['items'], [{'item': 'I1', 'item_name': 'Tea', 'qty': '3.000', 'lines': 2}])
+
+    def test_minutes_widens_the_window(self):
+        self.assertEqual(self.load({'minutes': '180'})['K1']['total_qty'], '8.000')
+
+    def test_explicit_window_excludes_its_end(self):
+        load = self.load({'from_time': self.earlier.isoformat(), 'to_time': self.recent.isoformat()})
+        self.assertEqual({k: entry['total_qty'] for k, entry in load.items()}, {'K1': '5.000'})
+
+    def test_kitchen_filter(self):
+        self.assertEqual(list(self.load({'kitchen': 'K2'})), ['K2'])
+        self.assertEqual(self.load({'kitchen': 'K9'}), {})
+
+    def test_bad_windows_are_rejected(self):
+        for params in (
+            {'minutes': '0'}, {'minutes': 'x'}, {'from_time': 'yesterday'},
+            {'from_time': self.recent.isoformat(), 'to_time': self.earlier.isoformat()},
+        ):
+            self.assertEqual(self.client.get('/api/kitchen_load/', params).status_code, 400, params)
+
+
+@primary_reads
+class ExportTests(TestCase):
+    def setUp(self):
+        DineBill.objects.create(billno=1, amount=Decimal('0.00001'), date_field=date(2024, 1, 1))
+        DineBill.objects.create(billno=2, amount=Decimal('12345678.5'), date_field=date(2024, 1, 2))
+        DineBillMonth.objects.create(billno=3, date_field=date(2023, 12, 31))
+        for slno, billno in ((1, 1), (2, 2), (3, 3)):
+            DineKotSalesDetail.objects.create(slno=slno, billno=billno, rate=Decimal('0.1'))
+
+    def export(self, name):
+        response = self.client.get(f'/api/export/{name}')
+        self.assertEqual(response.status_code, 200, name)
+        return b''.join(response.streaming_content)
+
+    def test_csv_writes_decimals_exactly(self):
+        rows = list(csv.reader(io.StringIO(self.export('dine_bill.csv').decode())))
+        self.assertEqual(rows[0], ['billno', 'time', 'user', 'amount', 'date'])
+        self.assertEqual([row[3] for row in rows[1:]], ['0.00001', '12345678.50000'])
+        self.assertEqual(
+            [row['rate'] for row in csv.DictReader(io.StringIO(self.export('dine_kot_sales_detail.csv').decode()))],
+            ['0.10000'] * 3,
+        )
+
+    def test_kot_lines_are_filtered_by_their_bills_date(self):
+        content = self.export('dine_kot_sales_detail.csv?from_date=2023-12-31&to_date=2024-01-01').decode()
+        self.assertEqual([row['billno'] for row in csv.DictReader(io.StringIO(content))], ['1', '3'])
+
+    @skipUnless(find_spec('pyarrow'), 'pyarrow is not installed')
+    def test_parquet_keeps_decimal_types(self):
+        import pyarrow.parquet
+        table = pyarrow.parquet.read_table(io.BytesIO(self.export('dine_bill.parquet')))
+        self.assertEqual(str(table.schema.field('amount').type), 'decimal128(13, 5)')
+        self.assertEqual(table.column('amount').to_pylist(), [Decimal('0.00001'), Decimal('12345678.50000')])
+        self.assertEqual(table.column('date').to_pylist(), [date(2024, 1, 1), date(2024, 1, 2)])
+
+    def test_unknown_table_or_format_is_404(self):
+        for name in ('acc_users.csv', 'dine_bill.xlsx'):
+            self.assertEqual(self.client.get(f'/api/export/{name}').status_code, 404, name)
+
+
+class AccUsersVerifyTests(TestCase):
+    def setUp(self):
+        credentials._verified.clear()
+        self.sync([{'id': 'u1', 'password': 'secret'}, {'id': 'u2', 'password': 'other'}])
+
+    def sync(self, users):
+        response = self.client.post('/api/acc_users/', json.dumps(users), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+    def verify(self, user_id, password, outlet=None):
+        headers = {'X-Outlet': outlet} if outlet else {}
+        return self.client.post(
+            '/api/acc_users/verify/', json.dumps({'id': user_id, 'password': password}),
+            content_type='application/json', headers=headers,
+        )
+
+    def test_right_password_is_verified(self):
+        for _ in range(2):  # the second check is answered from the LRU
+            response = self.verify('u1', 'secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json(), {'status': 'success', 'verified': True, 'id': 'u1'})
+
+    def test_wrong_password_is_401(self):
+        for user_id, password in (('u1', 'other'), ('u1', ''), ('u2', 'secret')):
+            response = self.verify(user_id, password)
+            self.assertEqual(response.status_code, 401)
+            self.assertFalse(response.json()['verified'])
+
+    def test_unknown_user_is_401_after_running_the_hasher(self):
+        with mock.patch('app1.credentials.hash_password', wraps=credentials.hash_password) as hash_password:
+            response = self.verify('nobody', 'secret')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['message'], 'Invalid id or password')
+        hash_password.assert_called_once_with('secret')
+        self.assertEqual(self.verify('u1', 'secret', outlet='o2').status_code, 401)  # logins are per outlet
+
+    def test_changed_password_replaces_the_old_one(self):
+        self.assertEqual(self.verify('u1', 'secret').status_code, 200)
+        self.sync([{'id': 'u1', 'password': 'new'}, {'id': 'u2', 'password': 'other'}])
+        self.assertEqual(self.verify('u1', 'secret').status_code, 401)
+        self.assertEqual(self.verify('u1', 'new').status_code, 200)
+
+    def test_resync_keeps_unchanged_hashes(self):
+        hashes = dict(AccUsers.objects.values_list('user_id', 'pass_hash'))
+        self.sync([{'id': 'u1', 'password': 'secret'}, {'id': 'u2', 'password': 'changed'}])
+        self.assertEqual(AccUsers.objects.get(user_id='u1').pass_hash, hashes['u1'])
+        self.assertNotEqual(AccUsers.objects.get(user_id='u2').pass_hash, hashes['u2'])
+
+    def test_missing_fields_are_400(self):
+        for body in ({'id': 'u1'}, {'password': 'secret'}, {'id': 1, 'password': 'secret'}, []):
+            response = self.client.post('/api/acc_users/verify/', json.dumps(body), content_type='application/json')
+            self.assertEqual(response.status_code, 400, body)
+
+
+@primary_reads
+class ErrorResponseTests(TestCase):
+    def test_bad_query_parameters_get_the_api_error_shape(self):
+        for url, message in (
+            ('/api/bills/?from_date=2024-1-1', 'from_date must be a date in YYYY-MM-DD format'),
+            ('/api/bills/?exclude_cancelled=maybe', 'exclude_cancelled must be 1 or 0'),
+            ('/api/bills/batch/?billnos=x', 'billnos must be a comma separated list of bill numbers'),
+            ('/api/items/price_list/?tier=9', 'tier must be 0-7'),
+            ('/api/kitchen_load/?minutes=0', 'minutes must be a positive whole number'),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+            self.assertEqual(response.json(), {'status': 'error', 'message': message})
+
+    def test_bad_sync_parameters_get_the_api_error_shape(self):
+        response = self.client.post('/api/bills/?max_errors=x', '[]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'status': 'error', 'message': 'max_errors must be an integer'})
+
+    def test_throttled_requests_keep_retry_after(self):
+        with mock.patch('app1.throttling.ReadRateThrottle.allow_request', return_value=False), \
+                mock.patch('app1.throttling.ReadRateThrottle.wait', return_value=3):
+            response = self.client.get('/api/bills/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3')
+        self.assertEqual(response.json()['status'], 'error')
+
+
+@override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=200, SYNC_MAX_BODY_SIZE=2000)
+class BodySizeTests(TestCase):
+    bills = json.dumps([{'billno': n, 'amount': '1.00000'} for n in range(20)])  # ~600 bytes
+
+    def test_sync_posts_get_the_larger_limit(self):
+        response = self.client.post('/api/bills/', self.bills, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['inserted'], 20)
+        response = self.client.post('/api/bills/', self.bills, content_type='application/json')
+        self.assertEqual(response['Idempotent-Replayed'], 'true')  # the body read early is the one fingerprinted
+
+        response = self.client.post('/api/bills/', self.bills * 4, content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(DineBill.objects.count(), 20)
+
+    def test_other_posts_keep_the_default_limit(self):
+        body = json.dumps({'id': 'u1', 'password': 'x' * 300})
+        response = self.client.post('/api/acc_users/verify/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.json()['status'], 'error')
+
+
+@override_settings(THROTTLE_LOCK_DIR=tempfile.mkdtemp(prefix='dine_sync_test_locks'))
+class TakeTokenTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = 1000.0
+        patcher = mock.patch('app1.throttling.time.time', lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_parse_rate(self):
+        self.assertEqual(parse_rate('120/min'), (120, 2.0))
+        self.assertEqual(parse_rate('5/s'), (5, 5.0))
+        self.assertEqual(parse_rate(None), (None, None))
+
+    def test_bucket_starts_full_then_reports_the_wait(self):
+        self.assertEqual([take_token('t', 3, 1.0) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(take_token('t', 3, 1.0), 1.0)
+
+    def test_bucket_refills_at_the_rate(self):
+        for _ in range(2):
+            take_token('t', 2, 0.5)
+        self.now += 1
+        self.assertAlmostEqual(take_token('t', 2, 0.5), 1.0)  # half a token back, half more to go
+        self.now += 1
+        self.assertEqual(take_token('t', 2, 0.5), 0)
+
+    def test_refill_never_exceeds_capacity(self):
+        take_token('t', 2, 1.0)
+        self.now += 3600
+        self.assertEqual([take_token('t', 2, 1.0) for _ in range(2)], [0, 0])
+        self.assertGreater(take_token('t', 2, 1.0), 0)
+
+    def test_buckets_are_independent(self):
+        take_token('a', 1, 1.0)
+        self.assertGreater(take_token('a', 1, 1.0), 0)
+        self.assertEqual(take_token('b', 1, 1.0), 0)
+
+
+@override_settings(
+    THROTTLE_LOCK_DIR=tempfile.mkdtemp(prefix='dine_sync_test_locks'),
+    REST_FRAMEWORK=dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={'read': '2/min', 'read_total': '5/min'}),
+)
+@primary_reads
+class ReadThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def statuses(self, address, count):
+        return [self.client.get('/api/bills/', REMOTE_ADDR=address).status_code for _ in range(count)]
+
+    def test_a_client_over_its_rate_leaves_the_shared_budget_alone(self):
+        self.assertEqual(self.statuses('10.0.0.1', 6), [200, 200, 429, 429, 429, 429])
+        self.assertEqual(self.statuses('10.0.0.2', 2), [200, 200])
+
+    def test_shared_budget_caps_all_clients_together(self):
+        self.assertEqual(self.statuses('10.0.0.1', 2) + self.statuses('10.0.0.2', 2), [200] * 4)
+        self.assertEqual(self.statuses('10.0.0.3', 2), [200, 429])
+
+
+class DateSpanScopeTests(TestCase):
+    def test_empty_payload_has_no_scope(self):
+        self.assertEqual(date_span_scope('date_field', []), (None, {'from_date': None, 'to_date': None, 'undated': False}))
+
+    def test_span_covers_earliest_to_latest(self):
+        _, span = date_span_scope('date_field', [date(2026, 10, 19), date(2026, 9, 20), date(2026, 10, 1)])
+        self.assertEqual(span, {'from_date': '2026-09-20', 'to_date': '2026-10-19', 'undated': False})
+
+    def test_rows_outside_the_span_are_left_alone(self):
+        for day in (date(2026, 9, 1), date(2026, 9, 20), date(2026, 10, 19), date(2026, 10, 20), None):
+            DineBillMonth.objects.create(billno=DineBillMonth.objects.count() + 1, date_field=day)
+        scope, _ = date_span_scope('date_field', [date(2026, 9, 20), date(2026, 10, 19)])
+        self.assertEqual(
+            sorted(DineBillMonth.objects.filter(scope).values_list('date_field', flat=True)),
+            [date(2026, 9, 20), date(2026, 10, 19)],
+        )
+
+    def test_undated_rows_only_when_the_payload_has_some(self):
+        DineBillMonth.objects.create(billno=1, date_field=None)
+        DineBillMonth.objects.create(billno=2, date_field=date(2026, 1, 1))
+        scope, span = date_span_scope('date_field', [None])
+        self.assertTrue(span['undated'])
+        self.assertEqual(list(DineBillMonth.objects.filter(scope).values_list('billno', flat=True)), [Decimal(1)])
+
+
+class SyncEventsViewTests(SimpleTestCase):
+    def test_wsgi_requests_are_refused(self):
+        response = self.client.get('/api/events/?outlet=o1')
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response.json()['status'], 'error')
+
+
+SEPARATE_REPLICA = 'replica1' in settings.DATABASES and not settings.DATABASES['replica1'].get('TEST', {}).get('MIRROR')
+
+
+@skipUnless(SEPARATE_REPLICA, 'needs a separate replica database (BENCH_READ_REPLICA=separate, see settings_bench)')
+@override_settings(READ_REPLICA_HEALTH_SECONDS=0)
+class ReadReplicaTests(TestCase):
+    """Reads against two real databases: the replica lags, holding bill 2 where the primary has bill 1"""
+    databases = {'default', 'replica1'} if SEPARATE_REPLICA else {'default'}
+
+    def setUp(self):
+        cache.clear()
+        routing._health.clear()
+        for outlet in ('o1', 'o2'):
+            DineBill.objects.using('default').create(outlet=outlet, billno=1)
+            DineBill.objects.using('replica1').create(outlet=outlet, billno=2)
+
+    def billnos(self, outlet):
+        response = self.client.get(f'/api/bills/?outlet={outlet}')
+        self.assertEqual(response.status_code, 200)
+        return [int(row['billno']) for row in response.json()['data']]
+
+    def test_gets_read_from_the_replica(self):
+        self.assertEqual(self.billnos('o1'), [2])
+
+    def test_syncs_write_to_the_primary_and_pin_the_outlet(self):
+        with self.captureOnCommitCallbacks(execute=True):  # the pin is set once the sync commits
+            response = self.client.post(
+                '/api/bills/?outlet=o1', json.dumps([{'billno': 3}]), content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(DineBill.objects.using('default').filter(outlet='o1').values_list('billno', flat=True)), [3])
+        self.assertEqual(self.billnos('o1'), [3])  # read your own write
+        self.assertEqual(self.billnos('o2'), [2])  # other outlets stay on the replica
+
+    def test_kitchen_load_is_computed_on_the_primary(self):
+        now = timezone.now()
+        DineBill.objects.using('default').filter(outlet='o1').update(time_field=now)
+        DineBill.objects.using('replica1').filter(outlet='o1').update(time_field=now)
+        DineKotSalesDetail.objects.using('default').create(outlet='o1', slno=1, billno=1, item='I1', qty=Decimal('2'))
+        response = self.client.get('/api/kitchen_load/?outlet=o1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['total_qty'] for entry in response.json()['data']], ['2.000'])
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        replica = connections['replica1']
+        with mock.patch.object(replica, 'ensure_connection', side_effect=OperationalError('timeout expired')), \
+                mock.patch.object(replica, 'close'):
+            self.assertEqual(self.billnos('o1'), [1])
+
+
+class RendererTests(SimpleTestCase):
+    def test_decimals_are_written_in_fixed_point(self):
+        self.assertEqual(_default(Decimal('1E+2')), '100')
+        self.assertEqual(_default(Decimal('0.0000001')), '0.0000001')
+        self.assertEqual(_default(Decimal('12.50000')), '12.50000')
@@ -0,0 +1,282 @@
+"""
+Admission control: keeps dashboard polling from starving the sync POSTs
+and a storm of simultaneous syncs from saturating the database.
+
+- Token buckets (DRF throttles) in the shared Django cache, so every
+  worker on the host draws from the same buckets. Rates use DRF's
+  DEFAULT_THROTTLE_RATES syntax ('120/min'): the bucket holds that many
+  tokens and refills at that rate.
+    'sync'        sync POSTs per client (outlet + address)
+    'login'       acc_users/verify POSTs per client, apart from the syncs
+    'read'        GETs per client
+    'read_total'  GETs of all clients together, so reads have their own
+                  budget and can never take every worker from the syncs;
+                  only GETs within their client's 'read' rate draw on it
+  Write buckets apply to views whose `throttle_scope` names them. Client
+  addresses come from DRF's get_ident(), which trusts X-Forwarded-For
+  only as far as NUM_PROXIES.
+- Body limits (BodySizeMiddleware): sync POSTs carry whole tables and may
+  send up to SYNC_MAX_BODY_SIZE; every other request is held to
+  DATA_UPLOAD_MAX_MEMORY_SIZE. Larger bodies get a 413 before any of
+  them is read.
+- Sync slots: one sync per outlet and table in flight at a time (outlets
+  sync the same table concurrently), and at most SYNC_MAX_IN_FLIGHT syncs
+  of any kind across all workers, so a burst of outlets cannot saturate
+  the database. A sync that finds no slot waits up to SYNC_QUEUE_SECONDS
+  and is then rejected with 429 and Retry-After.
+
+Buckets and slots are guarded with flock() on files in THROTTLE_LOCK_DIR;
+the kernel drops a dead worker's locks, so a crash never leaves a table
+blocked. Without fcntl (Windows) they fall back to in-process locks.
+"""
+import hashlib
+import io
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from rest_framework.exceptions import ParseError, Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .tenancy import request_outlet
+
+try:
+    import fcntl
+except ImportError:  # Windows (development): the locks only hold within one process
+    fcntl = None
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+LOCK_STRIPES = 64
+
+
+def _lock_path(name):
+    os.makedirs(settings.THROTTLE_LOCK_DIR, exist_ok=True)
+    return os.path.join(settings.THROTTLE_LOCK_DIR, name)
+
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _flock(path, blocking=True):
+    """Exclusive flock() on `path`; yields False instead when non-blocking and taken"""
+    if fcntl is None:
+        with _local_locks_guard:
+            lock = _local_locks.setdefault(path, threading.Lock())
+        if not lock.acquire(blocking):
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            lock.release()
+        return
+
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def parse_rate(rate):
+    """'120/min' -> (capacity 120, refill 2.0 tokens/s); None disables the bucket"""
+    if rate is None:
+        return None, None
+    num, period = rate.split('/')
+    seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+    return int(num), int(num) / seconds
+
+
+def take_token(key, capacity, refill):
+    """
+    Take one token from the bucket at `key`.
+
+    Returns 0 when a token was taken, otherwise the seconds until the next
+    one is available.
+    """
+    stripe = int(hashlib.blake2b(key.encode(), digest_size=2).hexdigest(), 16) % LOCK_STRIPES
+    with _flock(_lock_path(f'bucket.{stripe}.lock')):
+        now = time.time()
+        tokens, updated = cache.get(key) or (capacity, now)
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens >= 1:
+            cache.set(key, (tokens - 1, now), int(capacity / refill) + 1)
+            return 0
+        cache.set(key, (tokens, now), int(capacity / refill) + 1)
+        return (1 - tokens) / refill
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """A DRF throttle drawing one token per request from a shared bucket."""
+    scope = None
+    methods = None  # HTTP methods it applies to, None for all
+
+    def __init__(self):
+        self.capacity, self.refill = parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+        self.delay = None
+
+    def get_bucket_key(self, request, view):
+        raise NotImplementedError('.get_bucket_key() must be overridden')
+
+    def applies(self, request, view):
+        return not self.methods or request.method in self.methods
+
+    def allow_request(self, request, view):
+        if self.capacity is None or not self.applies(request, view):
+            return True
+        self.delay = take_token(self.get_bucket_key(request, view), self.capacity, self.refill)
+        return not self.delay
+
+    def wait(self):
+        return math.ceil(self.delay) if self.delay else None
+
+
+class ClientThrottle(TokenBucketThrottle):
+    """Per-client bucket, keyed by outlet and client address."""
+
+    def get_bucket_key(self, request, view):
+        try:
+            outlet = request_outlet(request)
+        except ParseError:
+            outlet = ''
+        return f'throttle:{self.scope}:{outlet}:{self.get_ident(request)}'
+
+
+class SyncRateThrottle(ClientThrottle):
+    """Writes to views with throttle_scope = 'sync'."""
+    scope = 'sync'
+    methods = WRITE_METHODS
+
+    def applies(self, request, view):
+        return super().applies(request, view) and getattr(view, 'throttle_scope', None) == self.scope
+
+
+class LoginRateThrottle(SyncRateThrottle):
+    """Login checks, so they neither use up nor are starved by the sync budget."""
+    scope = 'login'
+
+
+class ReadRateThrottle(ClientThrottle):
+    """
+    GETs: a token from the client's 'read' bucket, then one from the
+    'read_total' bucket of every client. Both in one throttle because DRF
+    runs every throttle class even after one refused the request, so a
+    client over its own rate would keep draining the shared budget.
+    """
+    scope = 'read'
+    total_scope = 'read_total'
+    methods = SAFE_METHODS
+
+    def __init__(self):
+        super().__init__()
+        self.total_capacity, self.total_refill = parse_rate(
+            api_settings.DEFAULT_THROTTLE_RATES.get(self.total_scope)
+        )
+
+    def allow_request(self, request, view):
+        if not super().allow_request(request, view):
+            return False
+        if self.total_capacity is None or not self.applies(request, view):
+            return True
+        self.delay = take_token(f'throttle:{self.total_scope}', self.total_capacity, self.total_refill)
+        return not self.delay
+
+
+class SyncBusy(Throttled):
+    default_detail = 'Another sync of this table is running.'
+    default_code = 'sync_busy'
+
+
+@contextmanager
+def _first_free(paths, deadline):
+    """Hold the first of `paths` that can be locked, polling until `deadline`; yields False on timeout"""
+    while True:
+        for path in paths:
+            with _flock(path, blocking=False) as acquired:
+                if acquired:
+                    yield True
+                    return
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.05)
+
+
+@contextmanager
+def sync_slot(outlet, table_name):
+    """
+    Hold the outlet's slot for the table and one of the SYNC_MAX_IN_FLIGHT
+    slots shared by every sync.
+
+    Waits (queues) up to SYNC_QUEUE_SECONDS for both, then raises SyncBusy
+    (429 with Retry-After).
+    """
+    deadline = time.monotonic() + settings.SYNC_QUEUE_SECONDS
+    with _first_free([_lock_path(f'sync.{outlet}.{table_name}.lock')], deadline) as acquired:
+        if not acquired:
+            raise SyncBusy(
+                wait=settings.SYNC_BUSY_RETRY_AFTER,
+                detail=f'Another {table_name} sync of outlet {outlet} is running, retry later.',
+            )
+        shared = [_lock_path(f'sync.slot.{n}.lock') for n in range(settings.SYNC_MAX_IN_FLIGHT)]
+        with _first_free(shared, deadline) as acquired:
+            if not acquired:
+                raise SyncBusy(
+                    wait=settings.SYNC_BUSY_RETRY_AFTER,
+                    detail=f'{settings.SYNC_MAX_IN_FLIGHT} syncs are running, retry later.',
+                )
+            yield
+
+
+class BodySizeMiddleware:
+    """
+    413 for request bodies over their view's limit, judged on Content-Length.
+
+    Django applies DATA_UPLOAD_MAX_MEMORY_SIZE only to request.body and
+    request.POST, while DRF parses request.data from the raw stream, so the
+    limit is enforced here for every view. Views with `large_body = True`
+    (the sync POSTs) get SYNC_MAX_BODY_SIZE; their body is read here, so
+    request.body no longer checks it against the smaller limit.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        large = request.method == 'POST' and getattr(view_class, 'large_body', False)
+        limit = settings.SYNC_MAX_BODY_SIZE if large else settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if limit is not None and length > limit:
+            return JsonResponse({
+                'status': 'error',
+                'message': f'Request body is larger than {limit} bytes'
+            }, status=413)
+        if large and length:
+            # what HttpRequest.body does, minus its DATA_UPLOAD_MAX_MEMORY_SIZE check
+            request._body = request.read()
+            request._stream = io.BytesIO(request._body)
+        return None
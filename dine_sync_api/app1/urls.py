@@ -1,11 +1,18 @@
 from django.urls import path
-from .views import AccUsersAPIView, TbItemMasterAPIView, DineBillAPIView, DineKotSalesDetailAPIView, CancelledBillsAPIView,DineBillMonthAPIView
+from .views import AccUsersAPIView, TbItemMasterAPIView, DineBillAPIView, DineKotSalesDetailAPIView, CancelledBillsAPIView,DineBillMonthAPIView, BillDetailAPIView, PriceListAPIView, KitchenLoadAPIView, SyncEventsView, ExportAPIView, AccUsersVerifyAPIView
 
 urlpatterns = [
     path('api/acc_users/', AccUsersAPIView.as_view(), name='acc_users_api'),
+    path('api/acc_users/verify/', AccUsersVerifyAPIView.as_view(), name='acc_users_verify_api'),
     path('api/items/', TbItemMasterAPIView.as_view(), name='items_api'),
+    path('api/items/price_list/', PriceListAPIView.as_view(), name='price_list_api'),  # ?tier=0..7
     path('api/bills/', DineBillAPIView.as_view(), name='bills_api'),
+    path('api/bills/batch/', BillDetailAPIView.as_view(), name='bill_batch_api'),  # ?billnos=1,2,3
+    path('api/bills/<int:billno>/', BillDetailAPIView.as_view(), name='bill_detail_api'),
     path('api/bills_month/', DineBillMonthAPIView.as_view(), name='bills_month_api'),  # NEW: Bills Month endpoint
     path('api/kot_sales/', DineKotSalesDetailAPIView.as_view(), name='kot_sales_api'),
+    path('api/kitchen_load/', KitchenLoadAPIView.as_view(), name='kitchen_load_api'),  # ?minutes=60&kitchen=
     path('api/cancelled_bills/', CancelledBillsAPIView.as_view(), name='cancelled_bills_api'),  # NEW: Cancelled Bills endpoint
+    path('api/export/<slug:table>.<slug:export_format>', ExportAPIView.as_view(), name='export_api'),  # e.g. dine_bill_month.csv
+    path('api/events/', SyncEventsView.as_view(), name='sync_events'),  # server-sent events, ASGI only
 ]
\ No newline at end of file
@@ -1,86 +1,172 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import connection, transaction
+from rest_framework.exceptions import ParseError
+import json
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.http import FileResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views import View
 from .models import AccUsers, TbItemMaster, DineBill, DineBillMonth, DineKotSalesDetail, CancelledBills
 from .serializers import (
     AccUsersSerializer, TbItemMasterSerializer, DineBillSerializer,
-    DineBillMonthSerializer, DineKotSalesDetailSerializer, CancelledBillsSerializer
+    DineBillMonthSerializer, DineKotSalesDetailSerializer, CancelledBillsSerializer, serialize_rows
 )
+from .sync import (
+    SyncAborted, apply_diff, current_generation, date_span_scope, diff_rows, lock_sync_state, payload_fingerprint,
+    record_sync, replayable_result, sync_errors_for, sync_validator, validate_rows
+)
+from .credentials import hash_passwords, verify_login
+from .events import get_channel
+from .export import CONTENT_TYPES, ExportUnavailable, export_fields, stream_csv, write_columnar
+from .item_cache import RATE_FIELDS, item_index
+from .tenancy import OutletMixin, request_outlet
+from .throttling import sync_slot
 import logging
 
 logger = logging.getLogger(__name__)
 
-def truncate_table(table_name):
+def filter_by_date(queryset, request, field_name='date_field'):
     """
-    Safely truncate a specific table - tries multiple approaches for different databases
+    Apply ?from_date=YYYY-MM-DD and ?to_date=YYYY-MM-DD (both inclusive) to a bill queryset.
+
+    Raises ParseError (400) for malformed dates.
     """
-    try:
-        with connection.cursor() as cursor:
-            # Method 1: Try simple TRUNCATE first (works for most databases)
-            try:
-                cursor.execute(f"TRUNCATE TABLE [{table_name}]")
-                logger.info(f"Successfully truncated table: {table_name}")
-                return True
-            except Exception as e1:
-                logger.warning(f"TRUNCATE failed for {table_name}: {str(e1)}, trying DELETE...")
-                
-                # Method 2: Use DELETE as fallback
-                try:
-                    cursor.execute(f"DELETE FROM [{table_name}]")
-                    logger.info(f"Successfully deleted all records from table: {table_name}")
-                    
-                    # Try to reset identity/auto-increment (SQL Server)
-                    try:
-                        cursor.execute(f"DBCC CHECKIDENT('{table_name}', RESEED, 0)")
-                        logger.info(f"Reset identity for table: {table_name}")
-                    except:
-                        pass  # Identity reset not critical
-                    
-                    return True
-                except Exception as e2:
-                    logger.error(f"DELETE also failed for {table_name}: {str(e2)}")
-                    return False
-                    
-    except Exception as e:
-        logger.error(f"General error truncating table {table_name}: {str(e)}")
+    for param, lookup in (('from_date', 'gte'), ('to_date', 'lte')):
+        value = request.query_params.get(param)
+        if not value:
+            continue
+        try:
+            parsed = parse_date(value) if len(value) == 10 else None
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ParseError(f'{param} must be a date in YYYY-MM-DD format')
+        queryset = queryset.filter(**{f'{field_name}__{lookup}': parsed})
+    return queryset
+
+
+def parse_flag(request, param):
+    """A boolean query parameter: 1/true/yes or 0/false/no, absent is False"""
+    value = request.query_params.get(param, '').strip().lower()
+    if value in ('', '0', 'false', 'no'):
         return False
+    if value in ('1', 'true', 'yes'):
+        return True
+    raise ParseError(f'{param} must be 1 or 0')
 
 
-def clear_table_orm(model_class):
+def filter_cancelled(queryset, request):
     """
-    Alternative: Use Django ORM to delete all records (safer but slower)
+    Apply ?exclude_cancelled=1 to a bill or KOT line queryset.
+
+    Filters on the is_cancelled flag kept at sync time (indexed with the
+    outlet and date), not an anti-join against cancelled_bills.
     """
-    try:
-        count = model_class.objects.all().delete()[0]
-        logger.info(f"Deleted {count} records from {model_class._meta.db_table} using ORM")
-        return True
-    except Exception as e:
-        logger.error(f"Error deleting from {model_class._meta.db_table}: {str(e)}")
-        return False
+    if parse_flag(request, 'exclude_cancelled'):
+        queryset = queryset.filter(is_cancelled=False)
+    return queryset
 
 
-class AccUsersAPIView(APIView):
-    
-    def get(self, request):
-        """Get all acc_users records"""
-        try:
-            users = AccUsers.objects.all()
-            serializer = AccUsersSerializer(users, many=True)
-            return Response({
-                'status': 'success',
-                'count': len(serializer.data),
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
-        except Exception as e:
-            logger.error(f"Error fetching users: {str(e)}")
+def mark_cancelled(outlet):
+    """
+    Bring is_cancelled of the outlet's bills (dine_bill, dine_bill_month)
+    and KOT lines in line with its cancelled_bills. Returns the number of
+    rows changed.
+    """
+    cancelled = CancelledBills.objects.filter(outlet=outlet).values('billno')
+    changed = 0
+    for model in (DineBill, DineBillMonth, DineKotSalesDetail):
+        bills = model.objects.filter(outlet=outlet)
+        changed += bills.filter(is_cancelled=False, billno__in=cancelled).update(is_cancelled=True)
+        changed += bills.filter(is_cancelled=True).exclude(billno__in=cancelled).update(is_cancelled=False)
+    return changed
+
+
+class TableSyncAPIView(OutletMixin, APIView):
+    """
+    POST replaces the calling outlet's slice of the table with the payload.
+
+    The payload is diffed against the current rows by `key_field` and only
+    the inserts, updates and deletes are written, so clients keep posting
+    the full table while unchanged rows cost nothing. A POST whose body is
+    byte-identical to the table's last committed sync is answered from the
+    stored result without touching the table.
+
+    Subclasses set the model/serializer and keep their own get(), which
+    should only read rows of self.outlet.
+    """
+    read_replica = True     # GETs may read from a replica, see routing.py
+    large_body = True       # POSTs may send up to SYNC_MAX_BODY_SIZE, see throttling.py
+    throttle_scope = 'sync'
+    model = None
+    serializer_class = None
+    table_name = None
+    key_field = None        # natural key the diff matches rows on
+    label = None            # name used in response messages, defaults to table_name
+    required_field = None   # rows without this key are rejected before validation
+
+    def get_label(self):
+        return self.label or self.table_name
+
+    def get_sync_scope(self, rows):
+        """
+        Rows a sync replaces, given the validated payload rows.
+
+        Returns (queryset, info); info is merged into the response. The
+        default scope is every row of the calling outlet.
+        """
+        return self.model.objects.filter(outlet=self.outlet), {'outlet': self.outlet}
+
+    def get_scope_outside(self, scope):
+        """Rest of the outlet's rows for a partial scope (see diff_rows), None when the scope is all of them"""
+        return None
+
+    def precompute_rows(self, rows):
+        """
+        Fill in columns that are slow to derive, before the sync transaction
+        opens so no database locks are held meanwhile. The outlet's sync slot
+        keeps its rows from changing until the sync commits.
+        """
+
+    def prepare_rows(self, rows, scope):
+        """Fill in columns derived at sync time, given the validated rows and the rows they replace"""
+
+    def update_dependents(self, diff):
+        """Update other tables' columns derived from this one after the write; returns info for the response"""
+        return {}
+
+    def post(self, request):
+        """Sync data - replace the table with the posted records"""
+        label = self.get_label()
+        errors = sync_errors_for(request)
+        fingerprint = payload_fingerprint(request)  # before request.data, see payload_fingerprint()
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if not isinstance(request.data, (list, dict)):
             return Response({
                 'status': 'error',
-                'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    def post(self, request):
-        """Sync data - CLEAR and CREATE NEW acc_users records"""
+                'message': f'Expected a list of {label} records or a single record object'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        previous = replayable_result(self.outlet, self.table_name, fingerprint, idempotency_key)
+        if previous is not None:
+            logger.info(f"Replaying last {self.table_name} sync of outlet {self.outlet}, payload unchanged")
+            return Response(previous, status=status.HTTP_200_OK, headers={'Idempotent-Replayed': 'true'})
+
+        # one sync per outlet and table, at most SYNC_MAX_IN_FLIGHT in all, see throttling.py
+        with sync_slot(self.outlet, self.table_name):
+            return self.sync(request, label, errors, fingerprint, idempotency_key)
+
+    def sync(self, request, label, errors, fingerprint, idempotency_key):
+        """Validate, diff and write the posted records"""
         try:
             data = request.data
             
@@ -88,434 +174,686 @@ class AccUsersAPIView(APIView):
             if isinstance(data, dict):
                 data = [data]
             
-            # Method 1: Try SQL TRUNCATE first
-            truncate_success = truncate_table('acc_users')
-            
-            # Method 2: If TRUNCATE fails, use Django ORM to clear table
-            if not truncate_success:
-                logger.warning("TRUNCATE failed, using Django ORM to clear acc_users table")
-                if not clear_table_orm(AccUsers):
-                    return Response({
-                        'status': 'error',
-                        'message': 'Failed to clear acc_users table'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            created_count = 0
-            errors = []
-            
-            # CREATE ALL NEW RECORDS
+            rows = validate_rows(
+                sync_validator(self.serializer_class), data, self.key_field, errors, self.required_field
+            )
+            if errors and not rows:
+                # an empty diff would delete every stored row
+                raise SyncAborted(errors, 'No valid records')
+            for row in rows.values():
+                row['outlet'] = self.outlet
+            self.precompute_rows(rows)
+            
+            # DIFF and WRITE in one transaction so a failed sync keeps the old rows
             with transaction.atomic():
-                for record in data:
-                    try:
-                        user_id = record.get('id')
-                        if not user_id:
-                            errors.append({'record': record, 'error': 'ID is required'})
-                            continue
-                        
-                        # Create new user
-                        serializer = AccUsersSerializer(data=record)
-                        if serializer.is_valid():
-                            serializer.save()
-                            created_count += 1
-                        else:
-                            errors.append({'record': record, 'error': serializer.errors})
-                                
-                    except Exception as e:
-                        errors.append({'record': record, 'error': str(e)})
-            
-            response_data = {
-                'status': 'success',
-                'message': f'Successfully synced {created_count} acc_users records (cleared table first)',
-                'created': created_count,
-                'total_received': len(data),
-                'errors': errors
-            }
-            
-            if errors:
-                response_data['status'] = 'partial_success'
+                state = lock_sync_state(self.outlet, self.table_name)
+                scope, scope_info = self.get_sync_scope(rows)
+                self.prepare_rows(rows, scope)
+                diff = diff_rows(scope, self.key_field, rows, outside=self.get_scope_outside(scope))
+                apply_diff(diff)
+                dependents = self.update_dependents(diff)
+                
+                counts = diff.summary()
+                changes = f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['deleted']} deleted"
+                if errors:
+                    message = f'Synced {len(rows)} {label} records with some errors ({changes})'
+                else:
+                    message = f'Successfully synced {len(rows)} {label} records ({changes})'
+                response_data = {
+                    'status': 'partial_success' if errors else 'success',
+                    'message': message,
+                    'created': len(rows),
+                    **counts,
+                    'total_received': len(data),
+                    **scope_info,
+                    **dependents,
+                    **errors.summary()
+                }
+                record_sync(state, fingerprint, idempotency_key, response_data)
             
             return Response(response_data, status=status.HTTP_200_OK)
             
+        except SyncAborted as e:
+            return Response({
+                'status': 'error',
+                'message': f'{e}; {label} sync rolled back, existing records kept',
+                'created': 0,
+                'total_received': len(data),
+                **e.errors.summary()
+            }, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            logger.error(f"Error syncing acc_users data: {str(e)}")
+            logger.error(f"Error syncing {label}: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class TbItemMasterAPIView(APIView):
+def sync_views(base=TableSyncAPIView):
+    """Every concrete sync view (one per table), including subclasses of intermediate bases"""
+    views = []
+    for view in base.__subclasses__():
+        if view.table_name:
+            views.append(view)
+        views.extend(sync_views(view))
+    return views
+
+
+class AccUsersAPIView(TableSyncAPIView):
+    model = AccUsers
+    serializer_class = AccUsersSerializer
+    table_name = 'acc_users'
+    key_field = 'user_id'
+    required_field = 'id'
+
+    def precompute_rows(self, rows):
+        stored = AccUsers.objects.filter(outlet=self.outlet).values_list('user_id', 'pass_field', 'pass_hash')
+        existing = {user_id: (pass_field, pass_hash) for user_id, pass_field, pass_hash in stored}
+        hash_passwords(rows.values(), existing)
 
     def get(self, request):
-        """Get all tb_item_master records"""
+        """Get the outlet's acc_users records"""
         try:
-            items = TbItemMaster.objects.all()
-            serializer = TbItemMasterSerializer(items, many=True)
+            users = AccUsers.objects.filter(outlet=self.outlet)
+            data = serialize_rows(users, AccUsersSerializer)
             return Response({
                 'status': 'success',
-                'count': len(serializer.data),
-                'data': serializer.data
+                'count': len(data),
+                'data': data
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Error fetching items: {str(e)}")
+            logger.error(f"Error fetching users: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+class AccUsersVerifyAPIView(OutletMixin, APIView):
+    """
+    Check one POS login without downloading acc_users: POST
+    {"id": ..., "password": ...} to /api/acc_users/verify/.
+    """
+    throttle_scope = 'login'
+
     def post(self, request):
-        """Sync data - CLEAR and CREATE NEW tb_item_master records"""
+        """Verify a login against the outlet's synced password hashes"""
+        data = request.data if isinstance(request.data, dict) else {}
+        user_id, password = data.get('id'), data.get('password')
+        if not isinstance(user_id, str) or not isinstance(password, str) or not user_id:
+            raise ParseError('id and password are required strings')
         try:
-            data = request.data
-            if isinstance(data, dict):
-                data = [data]
+            if verify_login(self.outlet, user_id, password):
+                return Response({
+                    'status': 'success',
+                    'verified': True,
+                    'id': user_id
+                }, status=status.HTTP_200_OK)
+            return Response({
+                'status': 'error',
+                'verified': False,
+                'message': 'Invalid id or password'
+            }, status=status.HTTP_401_UNAUTHORIZED)
+        except Exception as e:
+            logger.error(f"Error verifying login: {str(e)}")
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # Method 1: Try SQL TRUNCATE first
-            truncate_success = truncate_table('tb_item_master')
-            
-            # Method 2: If TRUNCATE fails, use Django ORM to clear table
-            if not truncate_success:
-                logger.warning("TRUNCATE failed, using Django ORM to clear tb_item_master table")
-                if not clear_table_orm(TbItemMaster):
-                    return Response({
-                        'status': 'error',
-                        'message': 'Failed to clear tb_item_master table'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            created_count = 0
-            errors = []
+class TbItemMasterAPIView(TableSyncAPIView):
+    model = TbItemMaster
+    serializer_class = TbItemMasterSerializer
+    table_name = 'tb_item_master'
+    key_field = 'item_code'
+    required_field = 'item_code'
 
-            # CREATE ALL NEW RECORDS
-            with transaction.atomic():
-                for rec in data:
-                    item_code = rec.get('item_code')
-                    if not item_code:
-                        errors.append({'record': rec, 'error': 'item_code is required'})
-                        continue
-
-                    try:
-                        # Create new item
-                        ser = TbItemMasterSerializer(data=rec)
-                        if ser.is_valid():
-                            ser.save()
-                            created_count += 1
-                        else:
-                            errors.append({'record': rec, 'error': ser.errors})
-                    except Exception as e:
-                        errors.append({'record': rec, 'error': str(e)})
-
-            response_data = {
+    def get(self, request):
+        """Get the outlet's tb_item_master records"""
+        try:
+            items = TbItemMaster.objects.filter(outlet=self.outlet)
+            data = serialize_rows(items, TbItemMasterSerializer)
+            return Response({
                 'status': 'success',
-                'message': f'Successfully synced {created_count} tb_item_master records (cleared table first)',
-                'created': created_count,
-                'total_received': len(data),
-                'errors': errors
-            }
-            
-            if errors:
-                response_data['status'] = 'partial_success'
-                
-            return Response(response_data, status=status.HTTP_200_OK)
-
+                'count': len(data),
+                'data': data
+            }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Error syncing tb_item_master: {str(e)}")
+            logger.error(f"Error fetching items: {str(e)}")
             return Response({
-                'status': 'error', 
+                'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class DineBillAPIView(APIView):
-    def post(self, request):
-        """
-        Sync dine_bill data - CLEAR and CREATE NEW records
-        """
+class CancellableSyncAPIView(TableSyncAPIView):
+    """
+    Tables whose rows belong to a bill (bills, KOT lines): each row carries
+    is_cancelled, set here from cancelled_bills and kept in step by
+    CancelledBillsAPIView's syncs.
+    """
+
+    def prepare_rows(self, rows, scope):
+        # cancelled_bills syncs rewrite the flags; wait for a running one so none are missed
+        lock_sync_state(self.outlet, CancelledBillsAPIView.table_name)
+        cancelled = set(CancelledBills.objects.filter(outlet=self.outlet).values_list('billno', flat=True))
+        for row in rows.values():
+            row['is_cancelled'] = row.get('billno') in cancelled
+
+
+class DineBillAPIView(CancellableSyncAPIView):
+    model = DineBill
+    serializer_class = DineBillSerializer
+    table_name = 'dine_bill'
+    key_field = 'billno'
+
+    def get(self, request):
+        """Get the outlet's dine_bill data, optionally for a date range (?from_date=&to_date=) and without cancelled bills (?exclude_cancelled=1)"""
+        bills = filter_cancelled(filter_by_date(DineBill.objects.filter(outlet=self.outlet), request), request)
         try:
-            data = request.data
-            
-            # Method 1: Try SQL TRUNCATE first
-            truncate_success = truncate_table('dine_bill')
-            
-            # Method 2: If TRUNCATE fails, use Django ORM to clear table
-            if not truncate_success:
-                logger.warning("TRUNCATE failed, using Django ORM to clear dine_bill table")
-                if not clear_table_orm(DineBill):
-                    return Response({
-                        'status': 'error',
-                        'message': 'Failed to clear dine_bill table'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            created_count = 0
-            errors = []
-            
-            # CREATE ALL NEW RECORDS
-            with transaction.atomic():
-                for item in data:
-                    serializer = DineBillSerializer(data=item)
-                    if serializer.is_valid():
-                        serializer.save()
-                        created_count += 1
-                    else:
-                        errors.append({'record': item, 'error': serializer.errors})
-            
-            if errors:
-                return Response({
-                    'status': 'partial_success',
-                    'message': f'Synced {created_count} dine_bill records with some errors (cleared table first)',
-                    'created': created_count,
-                    'total_received': len(data),
-                    'errors': errors
-                }, status=status.HTTP_200_OK)
-            
+            data = serialize_rows(bills, DineBillSerializer)
             return Response({
                 'status': 'success',
-                'message': f'Successfully synced {created_count} dine_bill records (cleared table first)',
-                'created': created_count,
-                'total_received': len(data)
+                'count': len(data),
+                'data': data
             }, status=status.HTTP_200_OK)
-            
         except Exception as e:
-            logger.error(f"Error syncing dine_bill: {str(e)}")
+            logger.error(f"Error fetching dine_bill: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
+
+
+class DineBillMonthAPIView(CancellableSyncAPIView):
+    """
+    Bill history.
+
+    A sync replaces only the date span its payload covers (earliest to
+    latest `date`), so a POS that sends a rolling window of recent bills
+    keeps everything dated before it as history.
+    """
+    model = DineBillMonth
+    serializer_class = DineBillMonthSerializer
+    table_name = 'dine_bill_month'
+    key_field = 'billno'
+
+    def get_sync_scope(self, rows):
+        scope, span = date_span_scope('date_field', (row.get('date_field') for row in rows.values()))
+        outlet_rows = self.model.objects.filter(outlet=self.outlet)
+        queryset = outlet_rows.filter(scope) if scope is not None else outlet_rows.none()
+        return queryset, {'outlet': self.outlet, **span}
+
+    def get_scope_outside(self, scope):
+        return self.model.objects.filter(outlet=self.outlet).exclude(pk__in=scope.values('pk'))
+
     def get(self, request):
-        """Get all dine_bill data"""
+        """Get the outlet's dine_bill_month data, optionally for a date range (?from_date=&to_date=) and without cancelled bills (?exclude_cancelled=1)"""
+        bills = filter_cancelled(filter_by_date(DineBillMonth.objects.filter(outlet=self.outlet), request), request)
         try:
-            bills = DineBill.objects.all()
-            serializer = DineBillSerializer(bills, many=True)
+            data = serialize_rows(bills, DineBillMonthSerializer)
             return Response({
                 'status': 'success',
-                'count': len(serializer.data),
-                'data': serializer.data
+                'count': len(data),
+                'data': data
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Error fetching dine_bill: {str(e)}")
+            logger.error(f"Error fetching dine_bill_month: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
 
-class DineBillMonthAPIView(APIView):
-    def post(self, request):
-        """
-        Sync dine_bill_month data - CLEAR and CREATE NEW records (ALL data)
-        """
+
+class DineKotSalesDetailAPIView(CancellableSyncAPIView):
+    model = DineKotSalesDetail
+    serializer_class = DineKotSalesDetailSerializer
+    table_name = 'dine_kot_sales_detail'
+    key_field = 'slno'
+    label = 'kot_sales_detail'
+
+    def get(self, request):
+        """Get the outlet's dine_kot_sales_detail data"""
         try:
-            data = request.data
-            
-            # Method 1: Try SQL TRUNCATE first
-            truncate_success = truncate_table('dine_bill_month')
-            
-            # Method 2: If TRUNCATE fails, use Django ORM to clear table
-            if not truncate_success:
-                logger.warning("TRUNCATE failed, using Django ORM to clear dine_bill_month table")
-                if not clear_table_orm(DineBillMonth):
-                    return Response({
-                        'status': 'error',
-                        'message': 'Failed to clear dine_bill_month table'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            created_count = 0
-            errors = []
-            
-            # CREATE ALL NEW RECORDS
-            with transaction.atomic():
-                for item in data:
-                    serializer = DineBillMonthSerializer(data=item)
-                    if serializer.is_valid():
-                        serializer.save()
-                        created_count += 1
-                    else:
-                        errors.append({'record': item, 'error': serializer.errors})
-            
-            if errors:
-                return Response({
-                    'status': 'partial_success',
-                    'message': f'Synced {created_count} dine_bill_month records with some errors (cleared table first)',
-                    'created': created_count,
-                    'total_received': len(data),
-                    'errors': errors
-                }, status=status.HTTP_200_OK)
-            
+            kot_details = DineKotSalesDetail.objects.filter(outlet=self.outlet)
+            data = serialize_rows(kot_details, DineKotSalesDetailSerializer)
             return Response({
                 'status': 'success',
-                'message': f'Successfully synced {created_count} dine_bill_month records (cleared table first)',
-                'created': created_count,
-                'total_received': len(data)
+                'count': len(data),
+                'data': data
             }, status=status.HTTP_200_OK)
-            
         except Exception as e:
-            logger.error(f"Error syncing dine_bill_month: {str(e)}")
+            logger.error(f"Error fetching kot sales detail: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
+
+
+class CancelledBillsAPIView(TableSyncAPIView):
+    model = CancelledBills
+    serializer_class = CancelledBillsSerializer
+    table_name = 'cancelled_bills'
+    key_field = 'billno'
+
+    def update_dependents(self, diff):
+        return {'rows_flagged': mark_cancelled(self.outlet)}
+
     def get(self, request):
-        """Get all dine_bill_month data"""
+        """Get the outlet's cancelled_bills data"""
         try:
-            bills = DineBillMonth.objects.all()
-            serializer = DineBillMonthSerializer(bills, many=True)
+            cancelled_bills = CancelledBills.objects.filter(outlet=self.outlet)
+            data = serialize_rows(cancelled_bills, CancelledBillsSerializer)
             return Response({
                 'status': 'success',
-                'count': len(serializer.data),
-                'data': serializer.data
+                'count': len(data),
+                'data': data
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Error fetching dine_bill_month: {str(e)}")
+            logger.error(f"Error fetching cancelled bills: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class DineKotSalesDetailAPIView(APIView):
-    def post(self, request):
-        """
-        Sync dine_kot_sales_detail data - CLEAR and CREATE NEW records
-        """
+def bill_details(outlet, billnos, exclude_cancelled=False):
+    """
+    Bills with their KOT lines and cancellation status, keyed by billno.
+
+    One indexed query per table whatever the number of bills: headers come
+    from dine_bill, falling back to dine_bill_month for older bills; lines
+    are enriched with the item's name and kitchen from the item index.
+    With exclude_cancelled, cancelled bills are left out as if missing.
+    """
+    headers = {}
+    for model, serializer_class, source in (
+        (DineBill, DineBillSerializer, 'dine_bill'),
+        (DineBillMonth, DineBillMonthSerializer, 'dine_bill_month'),
+    ):
+        wanted = [b for b in billnos if b not in headers]
+        if not wanted:
+            break
+        bills = model.objects.filter(outlet=outlet, billno__in=wanted)
+        if exclude_cancelled:
+            bills = bills.filter(is_cancelled=False)
+        bills = list(bills)
+        for bill, data in zip(bills, serializer_class(bills, many=True).data):
+            headers[int(bill.billno)] = dict(
+                data, source=source, cancelled=bill.is_cancelled, cancellation=None, lines=[]
+            )
+
+    if not headers:
+        return headers
+
+    lines = list(
+        DineKotSalesDetail.objects.filter(outlet=outlet, billno__in=list(headers)).order_by('billno', 'slno')
+    )
+    items = item_index(outlet)
+    for line, data in zip(lines, DineKotSalesDetailSerializer(lines, many=True).data):
+        item = items.get(line.item)
+        headers[int(line.billno)]['lines'].append(dict(
+            data,
+            item_name=item.item_name if item else None,
+            kitchen=item.kitchen if item else None,
+        ))
+
+    flagged = [b for b, header in headers.items() if header['cancelled']]
+    if flagged:
+        cancelled = CancelledBills.objects.filter(outlet=outlet, billno__in=flagged)
+        for bill, data in zip(cancelled, CancelledBillsSerializer(cancelled, many=True).data):
+            headers[int(bill.billno)]['cancellation'] = data
+
+    return headers
+
+
+def parse_billnos(value, limit):
+    """Comma separated bill numbers from a query parameter"""
+    try:
+        billnos = list(dict.fromkeys(int(part) for part in value.split(',') if part.strip()))
+    except ValueError:
+        raise ParseError('billnos must be a comma separated list of bill numbers')
+    if not billnos:
+        raise ParseError('billnos is required')
+    if len(billnos) > limit:
+        raise ParseError(f'At most {limit} bills per request')
+    return billnos
+
+
+class BillDetailAPIView(OutletMixin, APIView):
+    """
+    One bill (/api/bills/<billno>/) or many (/api/bills/batch/?billnos=1,2,3)
+    with its KOT lines, item names/kitchens and cancellation status.
+    ?exclude_cancelled=1 treats cancelled bills as not found.
+    """
+    read_replica = True
+
+    def get(self, request, billno=None):
+        """Get bill headers with their lines"""
+        if billno is not None:
+            billnos = [billno]
+        else:
+            billnos = parse_billnos(request.query_params.get('billnos', ''), settings.BILL_DETAIL_MAX_BATCH)
+        exclude_cancelled = parse_flag(request, 'exclude_cancelled')
         try:
-            data = request.data
-            
-            # Method 1: Try SQL TRUNCATE first
-            truncate_success = truncate_table('dine_kot_sales_detail')
-            
-            # Method 2: If TRUNCATE fails, use Django ORM to clear table
-            if not truncate_success:
-                logger.warning("TRUNCATE failed, using Django ORM to clear dine_kot_sales_detail table")
-                if not clear_table_orm(DineKotSalesDetail):
+            bills = bill_details(self.outlet, billnos, exclude_cancelled)
+
+            if billno is not None:
+                if billno not in bills:
                     return Response({
                         'status': 'error',
-                        'message': 'Failed to clear dine_kot_sales_detail table'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            created_count = 0
-            errors = []
-            
-            # CREATE ALL NEW RECORDS
-            with transaction.atomic():
-                for item in data:
-                    serializer = DineKotSalesDetailSerializer(data=item)
-                    if serializer.is_valid():
-                        serializer.save()
-                        created_count += 1
-                    else:
-                        errors.append({'record': item, 'error': serializer.errors})
-            
-            if errors:
+                        'message': f'Bill {billno} not found'
+                    }, status=status.HTTP_404_NOT_FOUND)
                 return Response({
-                    'status': 'partial_success',
-                    'message': f'Synced {created_count} kot_sales_detail records with some errors (cleared table first)',
-                    'created': created_count,
-                    'total_received': len(data),
-                    'errors': errors
+                    'status': 'success',
+                    'data': bills[billno]
                 }, status=status.HTTP_200_OK)
-            
+
             return Response({
                 'status': 'success',
-                'message': f'Successfully synced {created_count} kot_sales_detail records (cleared table first)',
-                'created': created_count,
-                'total_received': len(data)
+                'count': len(bills),
+                'data': [bills[b] for b in billnos if b in bills],
+                'missing': [b for b in billnos if b not in bills]
             }, status=status.HTTP_200_OK)
-            
         except Exception as e:
-            logger.error(f"Error syncing kot sales detail: {str(e)}")
+            logger.error(f"Error fetching bill details: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
+
+
+class PriceListAPIView(OutletMixin, APIView):
+    """
+    Price list for one rate tier, served from the in-process item index.
+
+    ?tier=0 is `rate`, ?tier=1..7 are `rate1`..`rate7`; ?category= and
+    ?kitchen= narrow the list.
+    """
+
     def get(self, request):
-        """Get all dine_kot_sales_detail data"""
+        """Get item_code, item_name and the tier's rate for the outlet's items"""
+        tier = request.query_params.get('tier', '0')
+        if not tier.isdigit() or int(tier) >= len(RATE_FIELDS):
+            raise ParseError(f'tier must be 0-{len(RATE_FIELDS) - 1}')
+        tier = int(tier)
         try:
-            kot_details = DineKotSalesDetail.objects.all()
-            serializer = DineKotSalesDetailSerializer(kot_details, many=True)
+            index = item_index(self.outlet)
+            records = index.select(
+                category=request.query_params.get('category'),
+                kitchen=request.query_params.get('kitchen'),
+            )
             return Response({
                 'status': 'success',
-                'count': len(serializer.data),
-                'data': serializer.data
+                'tier': RATE_FIELDS[tier],
+                'generation': index.generation,
+                'count': len(records),
+                'data': [
+                    {'item_code': r.item_code, 'item_name': r.item_name, 'rate': r.rates[tier]}
+                    for r in records
+                ]
             }, status=status.HTTP_200_OK)
         except Exception as e:
-            logger.error(f"Error fetching kot sales detail: {str(e)}")
+            logger.error(f"Error building price list: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-class CancelledBillsAPIView(APIView):
-    def post(self, request):
-        """
-        Sync cancelled_bills data - CLEAR and CREATE NEW records
-        """
+def parse_time_window(request, default_minutes):
+    """
+    (start, end) from ?from_time=/?to_time= (ISO datetimes) or ?minutes=N.
+
+    ?minutes is a window ending now; now is truncated to the minute so
+    every screen polling within that minute asks the same question.
+    """
+    params = request.query_params
+    if params.get('from_time') or params.get('to_time'):
+        bounds = []
+        for param in ('from_time', 'to_time'):
+            value = params.get(param)
+            try:
+                parsed = parse_datetime(value) if value else None
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise ParseError(f'{param} must be a datetime like YYYY-MM-DDTHH:MM[:SS]')
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            bounds.append(parsed)
+        if bounds[0] > bounds[1]:
+            raise ParseError('from_time must not be after to_time')
+        return tuple(bounds)
+
+    minutes = params.get('minutes', str(default_minutes))
+    if not minutes.isdigit() or int(minutes) < 1:
+        raise ParseError('minutes must be a positive whole number')
+    end = timezone.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    return end - timedelta(minutes=int(minutes)), end
+
+
+def kitchen_load(outlet, start, end, kitchen=None):
+    """
+    KOT quantities per kitchen and item for bills timed in [start, end).
+
+    The bill time comes from dine_bill and the kitchen from tb_item_master;
+    both are joined and the sums computed in one aggregate query, on the
+    primary: the result is cached under the generations read there, which
+    a lagging replica may not have caught up with yet.
+    """
+    lines = DineKotSalesDetail.objects.using(DEFAULT_DB_ALIAS).filter(
+        outlet=outlet,
+        billno__in=DineBill.objects.filter(
+            outlet=outlet, time_field__gte=start, time_field__lt=end
+        ).values('billno'),
+    ).annotate(
+        kitchen=Subquery(
+            TbItemMaster.objects.filter(outlet=outlet, item_code=OuterRef('item')).values('kitchen')[:1]
+        ),
+    )
+    if kitchen is not None:
+        lines = lines.filter(kitchen=kitchen)
+    rows = lines.values('kitchen', 'item').annotate(qty=Sum('qty'), lines=Count('row_id')).order_by('kitchen', 'item')
+
+    quantum = Decimal(1).scaleb(-DineKotSalesDetail._meta.get_field('qty').decimal_places)
+    items = item_index(outlet)
+    kitchens = {}
+    for row in rows:
+        qty = (row['qty'] or Decimal(0)).quantize(quantum)
+        entry = kitchens.setdefault(row['kitchen'], {'kitchen': row['kitchen'], 'total_qty': Decimal(0), 'items': []})
+        entry['total_qty'] += qty
+        item = items.get(row['item'])
+        entry['items'].append({
+            'item': row['item'],
+            'item_name': item.item_name if item else None,
+            'qty': format(qty, 'f'),
+            'lines': row['lines'],
+        })
+    for entry in kitchens.values():
+        entry['total_qty'] = format(entry['total_qty'], 'f')
+    return list(kitchens.values())
+
+
+class KitchenLoadAPIView(OutletMixin, APIView):
+    """
+    Live per-kitchen item counts for kitchen display screens.
+
+    /api/kitchen_load/?minutes=60 (default KITCHEN_LOAD_WINDOW_MINUTES) or
+    ?from_time=...&to_time=..., optionally ?kitchen=NAME. Results are cached
+    per window and per sync generation of the KOT, bill and item tables, so
+    screens polling between syncs share one query; that query runs on the
+    primary, never on a read replica.
+    """
+    source_tables = ('dine_kot_sales_detail', 'dine_bill', 'tb_item_master')
+
+    def get(self, request):
+        """Get KOT qty per kitchen and item for the time window"""
+        start, end = parse_time_window(request, settings.KITCHEN_LOAD_WINDOW_MINUTES)
+        kitchen = request.query_params.get('kitchen')
         try:
-            data = request.data
-            
-            # Method 1: Try SQL TRUNCATE first
-            truncate_success = truncate_table('cancelled_bills')
-            
-            # Method 2: If TRUNCATE fails, use Django ORM to clear table
-            if not truncate_success:
-                logger.warning("TRUNCATE failed, using Django ORM to clear cancelled_bills table")
-                if not clear_table_orm(CancelledBills):
-                    return Response({
-                        'status': 'error',
-                        'message': 'Failed to clear cancelled_bills table'
-                    }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-            created_count = 0
-            errors = []
-            
-            # CREATE ALL NEW RECORDS
-            with transaction.atomic():
-                for item in data:
-                    serializer = CancelledBillsSerializer(data=item)
-                    if serializer.is_valid():
-                        serializer.save()
-                        created_count += 1
-                    else:
-                        errors.append({'record': item, 'error': serializer.errors})
-            
-            if errors:
-                return Response({
-                    'status': 'partial_success',
-                    'message': f'Synced {created_count} cancelled_bills records with some errors (cleared table first)',
-                    'created': created_count,
-                    'total_received': len(data),
-                    'errors': errors
-                }, status=status.HTTP_200_OK)
-            
+            generations = {table: current_generation(self.outlet, table) for table in self.source_tables}
+            key = 'kitchen_load:{}:{}:{}:{}:{}'.format(
+                self.outlet, ':'.join(map(str, generations.values())),
+                start.isoformat(), end.isoformat(), kitchen if kitchen is not None else '*',
+            )
+            data = cache.get(key)
+            if data is None:
+                data = kitchen_load(self.outlet, start, end, kitchen)
+                cache.set(key, data, settings.KITCHEN_LOAD_CACHE_SECONDS)
             return Response({
                 'status': 'success',
-                'message': f'Successfully synced {created_count} cancelled_bills records (cleared table first)',
-                'created': created_count,
-                'total_received': len(data)
+                'from_time': start,
+                'to_time': end,
+                'generations': generations,
+                'count': len(data),
+                'data': data
             }, status=status.HTTP_200_OK)
-            
         except Exception as e:
-            logger.error(f"Error syncing cancelled bills: {str(e)}")
+            logger.error(f"Error computing kitchen load: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-    
-    def get(self, request):
-        """Get all cancelled_bills data"""
+
+
+def server_sent_event(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append('data: ' + json.dumps(data, separators=(',', ':')))
+    return '\n'.join(lines) + '\n\n'
+
+
+async def sync_event_stream(outlet, tables):
+    """
+    A `snapshot` of the tables' current generations, then a `sync` event
+    per committed sync of one of them, with keep-alive comments between.
+    """
+    subscription = get_channel().subscribe(settings.SYNC_EVENTS_KEEPALIVE_SECONDS)
+    try:
+        await anext(subscription)  # listening, so nothing committed after the snapshot is missed
+        generations = await sync_to_async(lambda: {t: current_generation(outlet, t) for t in tables})()
+        yield f'retry: {settings.SYNC_EVENTS_RETRY_MS}\n' + server_sent_event(
+            'snapshot', {'outlet': outlet, 'generations': generations}
+        )
+        async for event in subscription:
+            if event is None:
+                yield ': keepalive\n\n'
+            elif event['outlet'] == outlet and event['table'] in tables:
+                yield server_sent_event('sync', event, event_id=f"{event['table']}:{event['generation']}")
+    finally:
+        await subscription.aclose()
+
+
+class SyncEventsView(View):
+    """
+    Server-sent events announcing committed syncs: /api/events/, optionally
+    ?tables=dine_bill,dine_kot_sales_detail. Dashboards refetch a table only
+    when its generation moves instead of polling every GET endpoint.
+
+    The stream is open-ended, so it is only served under ASGI (asgi.py, e.g.
+    with uvicorn or daphne): a WSGI handler would collect the whole async
+    stream into a list before sending a byte, so it gets a 501 instead.
+    """
+
+    async def get(self, request):
+        if not isinstance(request, ASGIRequest):
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Event streams need the ASGI server (dine_sync_api.asgi)'
+            }, status=501)
         try:
-            cancelled_bills = CancelledBills.objects.all()
-            serializer = CancelledBillsSerializer(cancelled_bills, many=True)
+            outlet = request_outlet(request)
+        except ParseError as e:
+            return JsonResponse({'status': 'error', 'message': str(e.detail)}, status=400)
+
+        known = [view.table_name for view in sync_views()]
+        tables = [t for t in request.GET.get('tables', '').split(',') if t] or known
+        unknown = sorted(set(tables) - set(known))
+        if unknown:
+            return JsonResponse({
+                'status': 'error',
+                'message': f"Unknown tables: {', '.join(unknown)}"
+            }, status=400)
+
+        response = StreamingHttpResponse(sync_event_stream(outlet, tables), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'  # stop nginx buffering the stream
+        return response
+
+
+def kot_lines_by_bill_date(outlet, request):
+    """
+    KOT lines of the bills (current or month history) dated within
+    ?from_date/?to_date, without the lines of cancelled bills when
+    ?exclude_cancelled=1.
+    """
+    lines = filter_cancelled(DineKotSalesDetail.objects.filter(outlet=outlet), request)
+    if not (request.query_params.get('from_date') or request.query_params.get('to_date')):
+        return lines
+    billnos = [
+        filter_by_date(model.objects.filter(outlet=outlet), request).values('billno')
+        for model in (DineBill, DineBillMonth)
+    ]
+    return lines.filter(Q(billno__in=billnos[0]) | Q(billno__in=billnos[1]))
+
+
+class ExportAPIView(OutletMixin, APIView):
+    """
+    Bulk export for accountants and BI jobs:
+    /api/export/<table>.<csv|parquet|arrow>?from_date=...&to_date=...
+
+    dine_bill and dine_bill_month filter on the bill date; the KOT lines of
+    dine_kot_sales_detail are filtered by the date of their bill.
+    ?exclude_cancelled=1 leaves out cancelled bills and their lines.
+    """
+    read_replica = True
+    tables = {
+        'dine_bill': (DineBill, 'billno'),
+        'dine_bill_month': (DineBillMonth, 'billno'),
+        'dine_kot_sales_detail': (DineKotSalesDetail, 'slno'),
+    }
+
+    def get(self, request, table, export_format):
+        """Stream the outlet's rows of the table in the requested format"""
+        if table not in self.tables:
             return Response({
-                'status': 'success',
-                'count': len(serializer.data),
-                'data': serializer.data
-            }, status=status.HTTP_200_OK)
+                'status': 'error',
+                'message': f"Unknown table {table}, expected one of: {', '.join(self.tables)}"
+            }, status=status.HTTP_404_NOT_FOUND)
+        if export_format not in CONTENT_TYPES:
+            return Response({
+                'status': 'error',
+                'message': f"Unknown format {export_format}, expected one of: {', '.join(CONTENT_TYPES)}"
+            }, status=status.HTTP_404_NOT_FOUND)
+
+        model, key_field = self.tables[table]
+        if model is DineKotSalesDetail:
+            queryset = kot_lines_by_bill_date(self.outlet, request)
+        else:
+            queryset = filter_cancelled(filter_by_date(model.objects.filter(outlet=self.outlet), request), request)
+        queryset = queryset.order_by(key_field)
+        fields = export_fields(model)
+        filename = f'{self.outlet}_{table}.{export_format}'
+        try:
+            if export_format == 'csv':
+                response = StreamingHttpResponse(stream_csv(queryset, fields), content_type=CONTENT_TYPES['csv'])
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
+            return FileResponse(
+                write_columnar(queryset, fields, export_format),
+                as_attachment=True, filename=filename, content_type=CONTENT_TYPES[export_format],
+            )
+        except ExportUnavailable as e:
+            return Response({
+                'status': 'error',
+                'message': str(e)
+            }, status=status.HTTP_406_NOT_ACCEPTABLE)
         except Exception as e:
-            logger.error(f"Error fetching cancelled bills: {str(e)}")
+            logger.error(f"Error exporting {table}: {str(e)}")
             return Response({
                 'status': 'error',
                 'message': str(e)
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,81 @@
+"""
+Boot-time warm-up for API workers when WARM_UP_ON_READY is set
+(settings_api): the one-off work a worker would otherwise do while
+answering its first requests.
+
+App1Config.ready() only imports and builds the URL resolver, the views'
+serializers and DRF's renderers/parsers (warm_urls_and_serializers): it
+must not touch the database, and it may run in the gunicorn master
+(--preload) or on a thread that never serves a request.
+
+The database connections and the shared cache and item indexes are
+warmed by warm_worker(), called from gunicorn's post_worker_init hook
+(gunicorn.conf.py) once the worker process exists. Django connections
+belong to the thread that opened them, so connections are only opened
+there for the sync worker class, which answers requests on that same
+thread; threaded and ASGI workers open theirs on their first request.
+"""
+import logging
+import time
+
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _api_views(patterns):
+    for pattern in patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from _api_views(pattern.url_patterns)
+        else:
+            view_class = getattr(pattern.callback, 'view_class', None)
+            if view_class is not None:
+                yield view_class
+
+
+def warm_urls_and_serializers():
+    from rest_framework.settings import api_settings
+
+    resolver = get_resolver()
+    resolver.reverse_dict  # builds the resolver's lookup tables
+    for view_class in set(_api_views(resolver.url_patterns)):
+        serializer_class = getattr(view_class, 'serializer_class', None)
+        if serializer_class is not None:
+            serializer_class().fields
+    for setting in ('DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_CONTENT_NEGOTIATION_CLASS'):
+        getattr(api_settings, setting)
+
+
+def warm_connections():
+    for alias in connections:
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            logger.warning(f"Warm-up could not connect to database {alias}: {str(e)}")
+
+
+def warm_caches():
+    from .item_cache import item_index
+    from .models import SyncState
+
+    cache.get('warm_up')
+    try:
+        outlets = set(SyncState.objects.filter(table_name='tb_item_master').values_list('outlet', flat=True))
+    except DatabaseError as e:
+        logger.warning(f"Warm-up skipped the item indexes: {str(e)}")
+        return
+    for outlet in outlets:
+        item_index(outlet)
+
+
+def warm_worker(open_connections=True):
+    started = time.perf_counter()
+    steps = (warm_connections, warm_caches) if open_connections else (warm_caches,)
+    for step in steps:
+        try:
+            step()
+        except Exception as e:
+            logger.warning(f"Warm-up step {step.__name__} failed: {str(e)}")
+    logger.info(f"Worker warmed up in {(time.perf_counter() - started) * 1000:.0f} ms")
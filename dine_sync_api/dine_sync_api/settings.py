@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,6 +57,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app1.routing.ReadReplicaMiddleware',
+    'app1.throttling.BodySizeMiddleware',
 ]
 
 # REST Framework configuration
@@ -63,12 +67,97 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',  # Change this in production
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'app1.renderers.FastJSONRenderer',  # orjson when installed
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    # {'status': 'error', 'message': ...} like the views, not {'detail': ...}
+    'EXCEPTION_HANDLER': 'app1.exceptions.api_exception_handler',
+    # Token buckets in the shared cache, see app1/throttling.py
+    'DEFAULT_THROTTLE_CLASSES': [
+        'app1.throttling.SyncRateThrottle',
+        'app1.throttling.LoginRateThrottle',
+        'app1.throttling.ReadRateThrottle',       # 'read', then 'read_total'
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'sync': '60/min',         # per client: a terminal pushes its tables every cycle
+        'login': '30/min',        # per client: acc_users/verify
+        'read': '120/min',        # per client (dashboard)
+        'read_total': '50/s',     # all GETs together
+    },
+    # Proxies in front of the app (nginx: 1). Throttles key clients on the
+    # address X-Forwarded-For gets from the last of them; with 0 the header
+    # is ignored, so clients cannot forge a fresh bucket.
+    'NUM_PROXIES': int(os.environ.get('DINE_SYNC_NUM_PROXIES', '0')),
 }
+
+# Request body limits (app1.throttling.BodySizeMiddleware). Full-table sync
+# payloads (a busy outlet's dine_kot_sales_detail runs to tens of MB) are far
+# above Django's 2.5 MB default, which every other request keeps.
+DATA_UPLOAD_MAX_MEMORY_SIZE = 2621440  # Django's default, 2.5 MB
+SYNC_MAX_BODY_SIZE = int(os.environ.get('DINE_SYNC_MAX_BODY_MB', '100')) * 1024 * 1024
+
+# Sync admission control (app1/throttling.py): syncs allowed in flight at
+# once across all outlets and tables (each outlet syncs a table one at a
+# time), how long a sync waits for a slot before a 429, the Retry-After it
+# is given, and where the flock() files live.
+SYNC_MAX_IN_FLIGHT = int(os.environ.get('DINE_SYNC_MAX_IN_FLIGHT', '16'))
+SYNC_QUEUE_SECONDS = 5
+SYNC_BUSY_RETRY_AFTER = 10
+THROTTLE_LOCK_DIR = os.environ.get('DINE_SYNC_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'dine_sync_locks'))
+
+# Sync error reporting: how many distinct (field, error) groups and row
+# indices per group a sync response lists, and the default fail-fast
+# threshold (None = never abort; clients can pass ?max_errors=N).
+SYNC_ERROR_MAX_GROUPS = 50
+SYNC_ERROR_MAX_INDICES = 20
+SYNC_MAX_ERRORS = None
+# Rows per DELETE ... IN / bulk INSERT statement when a sync writes its diff.
+SYNC_BATCH_SIZE = 1000
+
+# acc_users passwords are hashed at sync time with this hasher (it must be in
+# PASSWORD_HASHERS), at this many iterations for the PBKDF2 hashers (None for
+# the hasher's default, 1,000,000 for pbkdf2_sha256). The POS still syncs the
+# plaintext `pass` column, so a slow hash would protect nothing while costing
+# ~0.45 s per changed password; the salted hash only lets verify/ check logins
+# without serving passwords. Raise it once `pass` is no longer stored: stored
+# hashes keep verifying and are redone at the next sync.
+# /api/acc_users/verify/ remembers this many recent successful logins per
+# worker to skip rehashing.
+ACC_USERS_PASSWORD_HASHER = 'pbkdf2_sha256'
+ACC_USERS_PASSWORD_ITERATIONS = 1000
+ACC_USERS_VERIFY_CACHE_SIZE = 1024
+
+# Build the URL resolver and serializers while the app loads, and open
+# connections and build caches once a gunicorn worker starts (app1/warmup.py,
+# gunicorn.conf.py); settings_api turns this on for the API workers.
+WARM_UP_ON_READY = False
+
+# Most bills one /api/bills/batch/ request may ask for.
+BILL_DETAIL_MAX_BATCH = 500
+# Default window of /api/kitchen_load/ and how long a computed window stays
+# cached; the cache key also carries the source tables' sync generations.
+KITCHEN_LOAD_WINDOW_MINUTES = 60
+KITCHEN_LOAD_CACHE_SECONDS = 300
+
+# /api/events/ fan-out between worker processes: 'file' tails an append-only
+# JSON-lines file shared by the workers of one host, 'postgres' uses
+# LISTEN/NOTIFY on the default database (needs psycopg >= 3.2).
+SYNC_EVENTS_BACKEND = os.environ.get('DINE_SYNC_EVENTS_BACKEND', 'file')
+SYNC_EVENTS_FILE = os.environ.get(
+    'DINE_SYNC_EVENTS_FILE', os.path.join(tempfile.gettempdir(), 'dine_sync_events', 'events.jsonl')
+)
+SYNC_EVENTS_FILE_MAX_BYTES = 1024 * 1024  # rotated to events.jsonl.1 beyond this
+SYNC_EVENTS_POLL_SECONDS = 0.5
+SYNC_EVENTS_KEEPALIVE_SECONDS = 15
+SYNC_EVENTS_RETRY_MS = 3000  # client reconnect delay sent in the stream
+
+# /api/export/: rows fetched (and written per Parquet row group) at a time,
+# and the Parquet codec.
+EXPORT_BATCH_ROWS = 50000
+EXPORT_PARQUET_COMPRESSION = 'zstd'
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
     "http://127.0.0.1:3000",
@@ -114,6 +203,49 @@ DATABASES = {
     }
 }
 
+# Read replicas of the primary above, as DINE_SYNC_READ_REPLICAS=host[:port],...
+# GET handlers read from them (see app1/routing.py); syncs stay on 'default'.
+# A replica that is down must fail its health check quickly instead of
+# holding the request for the OS TCP timeout, hence the short connect_timeout
+# (seconds) before reads fall back to the primary.
+READ_REPLICA_CONNECT_TIMEOUT = int(os.environ.get('DINE_SYNC_REPLICA_CONNECT_TIMEOUT', '2'))
+READ_REPLICAS = []
+for _n, _replica in enumerate(filter(None, os.environ.get('DINE_SYNC_READ_REPLICAS', '').split(',')), start=1):
+    _host, _, _port = _replica.strip().partition(':')
+    DATABASES[f'replica{_n}'] = dict(
+        DATABASES['default'], HOST=_host, PORT=_port or DATABASES['default']['PORT'],
+        OPTIONS=dict(DATABASES['default'].get('OPTIONS', {}), connect_timeout=READ_REPLICA_CONNECT_TIMEOUT),
+        TEST={'MIRROR': 'default'},
+    )
+    READ_REPLICAS.append(f'replica{_n}')
+
+DATABASE_ROUTERS = ['app1.routing.ReadReplicaRouter']
+# How long an outlet's reads stay on the primary after its sync commits
+# (should exceed the replication lag), and how often a worker re-checks
+# a replica's health.
+READ_REPLICA_PIN_SECONDS = 10
+READ_REPLICA_HEALTH_SECONDS = 5
+
+
+# Cache
+# File based so every worker process on the host shares it: sync
+# generations are published here and read by the in-process caches.
+# Once MAX_ENTRIES is reached every set() deletes a random third of the
+# entries, generations, replica pins and throttle buckets included, so it
+# sits far above the expected key count: per outlet 6 generations, a pin,
+# a few buckets per terminal and dashboard and the kitchen_load windows,
+# i.e. a few thousand keys for hundreds of outlets.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DINE_SYNC_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dine_sync_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('DINE_SYNC_CACHE_MAX_ENTRIES', '100000')),
+        },
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -0,0 +1,49 @@
+"""
+Lean settings for the API workers (gunicorn/uvicorn):
+
+    DJANGO_SETTINGS_MODULE=dine_sync_api.settings_api
+
+Same as settings.py minus what a JSON API without logins never uses: the
+admin, auth, sessions, messages and static files apps, and the session,
+CSRF, auth, messages and clickjacking middleware. Workers import less and
+every request runs fewer middleware. Database connections are kept
+between requests; the URL resolver and serializers are built when the
+app loads (App1Config.ready) and the connections and caches when a
+gunicorn worker starts (gunicorn.conf.py, app1/warmup.py).
+
+Management commands (migrate, bench) keep using settings.py.
+"""
+from .settings import *  # noqa: F401,F403
+
+INSTALLED_APPS = [
+    'app1',
+    'corsheaders',
+]
+
+MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'app1.routing.ReadReplicaMiddleware',
+    'app1.throttling.BodySizeMiddleware',
+]
+
+ROOT_URLCONF = 'dine_sync_api.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,  # noqa: F405
+    # no django.contrib.auth: requests are anonymous without an AnonymousUser
+    DEFAULT_AUTHENTICATION_CLASSES=[],
+    UNAUTHENTICATED_USER=None,
+)
+
+# Keep connections open across requests so the ones opened at boot are reused.
+API_CONN_MAX_AGE = 600
+DATABASES = {
+    alias: dict(db, CONN_MAX_AGE=API_CONN_MAX_AGE, CONN_HEALTH_CHECKS=True)
+    for alias, db in DATABASES.items()  # noqa: F405
+}
+
+WARM_UP_ON_READY = True
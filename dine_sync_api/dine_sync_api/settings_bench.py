@@ -0,0 +1,97 @@
+"""
+Settings for `manage.py bench` runs.
+
+Same as settings.py, but the database comes from the environment so the
+benchmarks never touch the production server:
+
+    BENCH_DB=sqlite   (default) a local SQLite file
+    BENCH_DB=postgres a local Postgres, configured with BENCH_PG_NAME,
+                      BENCH_PG_USER, BENCH_PG_PASSWORD, BENCH_PG_HOST, BENCH_PG_PORT
+
+The bench and load_test commands create and drop their own test database
+on that server.
+BENCH_PROFILE=api swaps in the lean API profile of settings_api.py.
+"""
+import os
+import tempfile
+
+from .settings import *  # noqa: F401,F403
+
+DEBUG = False
+
+if os.environ.get('BENCH_DB', 'sqlite') == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('BENCH_PG_NAME', 'dine_sync_bench'),
+            'USER': os.environ.get('BENCH_PG_USER', 'postgres'),
+            'PASSWORD': os.environ.get('BENCH_PG_PASSWORD', ''),
+            'HOST': os.environ.get('BENCH_PG_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('BENCH_PG_PORT', '5432'),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'bench.sqlite3',  # noqa: F405
+            # concurrent syncs (manage.py load_test) wait for the write lock
+            # instead of failing with 'database is locked'
+            'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 30},
+        }
+    }
+
+# BENCH_READ_REPLICA=1 adds a replica alias that mirrors the bench database,
+# so reads go through the replica routing and its health checks.
+# BENCH_READ_REPLICA=separate makes the replica a second SQLite database that
+# nothing replicates into, so a test can tell which database a read hit (the
+# ReadReplicaTests in app1/tests.py run only then):
+#
+#     BENCH_READ_REPLICA=separate DJANGO_SETTINGS_MODULE=dine_sync_api.settings_bench \
+#         python manage.py test app1
+READ_REPLICAS = []
+if os.environ.get('BENCH_READ_REPLICA') == 'separate':
+    DATABASES['replica1'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench_replica.sqlite3',  # noqa: F405
+    }
+    READ_REPLICAS = ['replica1']
+elif os.environ.get('BENCH_READ_REPLICA'):
+    DATABASES['replica1'] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    READ_REPLICAS = ['replica1']
+
+# BENCH_PROFILE=api runs the lean API profile (settings_api) on the bench database.
+if os.environ.get('BENCH_PROFILE') == 'api':
+    from . import settings_api
+
+    INSTALLED_APPS = settings_api.INSTALLED_APPS
+    MIDDLEWARE = settings_api.MIDDLEWARE
+    ROOT_URLCONF = settings_api.ROOT_URLCONF
+    TEMPLATES = settings_api.TEMPLATES
+    REST_FRAMEWORK = settings_api.REST_FRAMEWORK
+    WARM_UP_ON_READY = settings_api.WARM_UP_ON_READY
+    DATABASES = {
+        alias: dict(db, CONN_MAX_AGE=settings_api.API_CONN_MAX_AGE, CONN_HEALTH_CHECKS=True)
+        for alias, db in DATABASES.items()
+    }
+
+# Keep the throttles in the measured path, with rates the benchmark never reaches.
+REST_FRAMEWORK = dict(REST_FRAMEWORK, DEFAULT_THROTTLE_RATES={  # noqa: F405
+    'sync': '1000000/s',
+    'login': '1000000/s',
+    'read': '1000000/s',
+    'read_total': '1000000/s',
+})
+THROTTLE_LOCK_DIR = os.path.join(tempfile.gettempdir(), 'dine_sync_bench_locks')
+
+# The bench database is thrown away after each run, so the sync
+# generations it publishes must not outlive the process either.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': CACHES['default']['OPTIONS'],  # noqa: F405
+    }
+}
+
+# Keep benchmark syncs off the events file real dashboards are tailing.
+SYNC_EVENTS_FILE = os.path.join(tempfile.gettempdir(), 'dine_sync_bench_events', 'events.jsonl')
@@ -0,0 +1,9 @@
+"""
+URL configuration for the lean API profile (settings_api): the app's
+endpoints without the admin site.
+"""
+from django.urls import path, include
+
+urlpatterns = [
+    path('', include('app1.urls')),
+]
@@ -0,0 +1,19 @@
+"""
+gunicorn settings for the API workers, read from the working directory:
+
+    DJANGO_SETTINGS_MODULE=dine_sync_api.settings_api gunicorn dine_sync_api.wsgi
+
+Workers, threads and binding stay on the command line.
+"""
+
+
+def post_worker_init(worker):
+    """Warm the worker's connections and caches before it takes requests"""
+    from django.conf import settings
+    from gunicorn.workers.sync import SyncWorker
+
+    if getattr(settings, 'WARM_UP_ON_READY', False):
+        from app1.warmup import warm_worker
+
+        # only the sync worker answers requests on this thread
+        warm_worker(open_connections=isinstance(worker, SyncWorker))